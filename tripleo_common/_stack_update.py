@@ -22,6 +22,8 @@ import six
 
 import heatclient.exc
 
+from tripleo_common.utils import waiter as waiter_utils
+
 LOG = logging.getLogger(__name__)
 
 
@@ -86,12 +88,16 @@ class StackUpdateManager(object):
         self.clear_breakpoints(resources['on_breakpoint'].keys())
 
     def do_interactive_update(self):
-        status, _ = self.get_status()
+        statuses = [self.get_status()[0]]
+
+        def _started():
+            if statuses[-1] not in ['COMPLETE', 'FAILED']:
+                return True
+            statuses.append(self.get_status()[0])
 
         # wait for the stack-update to start
-        while status in ['COMPLETE', 'FAILED']:
-            status, _ = self.get_status()
-            time.sleep(5)
+        waiter_utils.Waiter(delay=1, max_delay=5).wait(_started)
+        status = statuses[-1]
 
         while status not in ['COMPLETE', 'FAILED']:
             status, resources = self.get_status()
@@ -19,12 +19,27 @@ from mistral.workflow import utils as mistral_workflow_utils
 from oslo_utils import units
 
 from tripleo_common.actions import base
+from tripleo_common.actions import parameters
+from tripleo_common import constants
 from tripleo_common import exception
 from tripleo_common.utils import glance
+from tripleo_common.utils import introspection
 from tripleo_common.utils import nodes
+from tripleo_common.utils import retries
 
 LOG = logging.getLogger(__name__)
 
+# Batch actions report the nodes which failed, so they give up on a node
+# quickly instead of stalling the whole batch
+_BATCH_RETRY_POLICY = retries.RetryPolicy(max_retries=3, deadline=15)
+
+
+def _batch_error(description, errors):
+    """Return the error message of an action run on many nodes."""
+    return ("Failed to %s of %d node(s):\n%s" %
+            (description, len(errors),
+             '\n'.join('%s: %s' % item for item in sorted(errors.items()))))
+
 
 class RegisterOrUpdateNodes(base.TripleOAction):
     """Register Nodes Action
@@ -35,17 +50,21 @@ class RegisterOrUpdateNodes(base.TripleOAction):
     :param ramdisk_name: Glance ID of the ramdisk to use for the nodes.
     :param instance_boot_option: Whether to set instances for booting from
                                  local hard drive (local) or network (netboot).
+    :param concurrency: How many nodes to register or update at the same
+                        time.
     :return: list of node objects representing the new nodes.
     """
 
     def __init__(self, nodes_json, remove=False, kernel_name=None,
-                 ramdisk_name=None, instance_boot_option='local'):
+                 ramdisk_name=None, instance_boot_option='local',
+                 concurrency=1):
         super(RegisterOrUpdateNodes, self).__init__()
         self.nodes_json = nodes_json
         self.remove = remove
         self.instance_boot_option = instance_boot_option
         self.kernel_name = kernel_name
         self.ramdisk_name = ramdisk_name
+        self.concurrency = concurrency
 
     def run(self):
         for node in self.nodes_json:
@@ -65,7 +84,8 @@ class RegisterOrUpdateNodes(base.TripleOAction):
                 remove=self.remove,
                 glance_client=image_client,
                 kernel_name=self.kernel_name,
-                ramdisk_name=self.ramdisk_name)
+                ramdisk_name=self.ramdisk_name,
+                concurrency=self.concurrency)
         except Exception as err:
             LOG.exception("Error registering nodes with ironic.")
             return mistral_workflow_utils.Result(
@@ -74,6 +94,80 @@ class RegisterOrUpdateNodes(base.TripleOAction):
             )
 
 
+class ValidateNodes(base.TripleOAction):
+    """Validate nodes before registering them
+
+    The nodes are either given directly or streamed from a Swift object
+    holding an instackenv file, so very large inventories are never fully
+    loaded in memory.
+
+    :param nodes_json: list of nodes & attributes in json format
+    :param container: Swift container holding the instackenv file, used
+                      when nodes_json is not given.
+    :param object_name: name of the instackenv file in the container.
+    :return: None, or an error listing every invalid node.
+    """
+
+    def __init__(self, nodes_json=None, container=None,
+                 object_name='instackenv.json'):
+        super(ValidateNodes, self).__init__()
+        self.nodes_json = nodes_json
+        self.container = container
+        self.object_name = object_name
+
+    def run(self):
+        try:
+            if self.nodes_json is not None:
+                nodes_list = self.nodes_json
+            else:
+                swift = self._get_object_client()
+                chunks = swift.get_object(self.container, self.object_name,
+                                          resp_chunk_size=units.Mi)[1]
+                nodes_list = nodes.iter_nodes_json(chunks)
+            errors = nodes.validate_nodes(nodes_list)
+        except Exception as err:
+            LOG.exception("Error reading nodes.")
+            return mistral_workflow_utils.Result(
+                "",
+                "%s: %s" % (type(err).__name__, str(err))
+            )
+
+        if errors:
+            error = "%d invalid node(s) found:\n%s" % (len(errors),
+                                                       "\n".join(errors))
+            return mistral_workflow_utils.Result("", error)
+
+
+def _boot_configuration_patch(node, image_ids, instance_boot_option):
+    """Build the patch setting the boot option and deploy images of a node."""
+    capabilities = node.properties.get('capabilities', {})
+    capabilities = nodes.capabilities_to_dict(capabilities)
+    if instance_boot_option is not None:
+        capabilities['boot_option'] = instance_boot_option
+    else:
+        # Add boot option capability if it didn't exist
+        capabilities.setdefault('boot_option', 'local')
+    capabilities = nodes.dict_to_capabilities(capabilities)
+
+    return [
+        {
+            'op': 'add',
+            'path': '/properties/capabilities',
+            'value': capabilities,
+        },
+        {
+            'op': 'add',
+            'path': '/driver_info/deploy_ramdisk',
+            'value': image_ids['ramdisk'],
+        },
+        {
+            'op': 'add',
+            'path': '/driver_info/deploy_kernel',
+            'value': image_ids['kernel'],
+        },
+    ]
+
+
 class ConfigureBootAction(base.TripleOAction):
     """Configure kernel and ramdisk.
 
@@ -103,40 +197,155 @@ class ConfigureBootAction(base.TripleOAction):
                     image_client, self.kernel_name, self.ramdisk_name)
 
             node = baremetal_client.node.get(self.node_uuid)
-
-            capabilities = node.properties.get('capabilities', {})
-            capabilities = nodes.capabilities_to_dict(capabilities)
-            if self.instance_boot_option is not None:
-                capabilities['boot_option'] = self.instance_boot_option
-            else:
-                # Add boot option capability if it didn't exist
-                capabilities.setdefault(
-                    'boot_option', self.instance_boot_option or 'local')
-            capabilities = nodes.dict_to_capabilities(capabilities)
-
-            baremetal_client.node.update(node.uuid, [
-                {
-                    'op': 'add',
-                    'path': '/properties/capabilities',
-                    'value': capabilities,
-                },
-                {
-                    'op': 'add',
-                    'path': '/driver_info/deploy_ramdisk',
-                    'value': image_ids['ramdisk'],
-                },
-                {
-                    'op': 'add',
-                    'path': '/driver_info/deploy_kernel',
-                    'value': image_ids['kernel'],
-                },
-            ])
+            baremetal_client.node.update(node.uuid, _boot_configuration_patch(
+                node, image_ids, self.instance_boot_option))
             LOG.debug("Configuring boot option for Node %s", self.node_uuid)
         except Exception as err:
             LOG.exception("Error configuring node boot options with Ironic.")
             return mistral_workflow_utils.Result("", err)
 
 
+class ConfigureBootNodesAction(base.TripleOAction):
+    """Configure kernel and ramdisk for many nodes at once.
+
+    The deploy images are looked up once, all the nodes are fetched with a
+    single listing and the nodes are then updated concurrently.
+
+    :param node_uuids: list of Ironic node UUIDs
+    :param kernel_name: Glance name of the kernel to use for the nodes.
+    :param ramdisk_name: Glance name of the ramdisk to use for the nodes.
+    :param instance_boot_option: Whether to set instances for booting from
+                                 local hard drive (local) or network (netboot).
+    :param concurrency: How many nodes to update at the same time.
+    :return: dictionary mapping every node UUID to None on success or to
+             an error message.
+    """
+
+    baremetal_retry_policy = _BATCH_RETRY_POLICY
+
+    def __init__(self, node_uuids, kernel_name='bm-deploy-kernel',
+                 ramdisk_name='bm-deploy-ramdisk', instance_boot_option=None,
+                 concurrency=1):
+        super(ConfigureBootNodesAction, self).__init__()
+        self.node_uuids = node_uuids
+        self.kernel_name = kernel_name
+        self.ramdisk_name = ramdisk_name
+        self.instance_boot_option = instance_boot_option
+        self.concurrency = concurrency
+
+    def run(self):
+        baremetal_client = self._get_baremetal_client()
+        image_client = self._get_image_client()
+
+        try:
+            image_ids = {'kernel': None, 'ramdisk': None}
+            if self.kernel_name is not None and self.ramdisk_name is not None:
+                image_ids = glance.create_or_find_kernel_and_ramdisk(
+                    image_client, self.kernel_name, self.ramdisk_name)
+
+        except Exception as err:
+            LOG.exception("Error configuring node boot options with Ironic.")
+            return mistral_workflow_utils.Result("", err)
+
+        def _configure(node):
+            baremetal_client.node.update(node.uuid, _boot_configuration_patch(
+                node, image_ids, self.instance_boot_option))
+            LOG.debug("Configuring boot option for Node %s", node.uuid)
+
+        try:
+            _configured, errors = nodes.run_on_nodes(
+                baremetal_client, self.node_uuids, _configure,
+                'configure boot options', concurrency=self.concurrency)
+        except Exception as err:
+            LOG.exception("Error listing nodes to configure boot options.")
+            return mistral_workflow_utils.Result("", err)
+
+        results = {node_uuid: errors.get(node_uuid)
+                   for node_uuid in self.node_uuids}
+        if errors:
+            return mistral_workflow_utils.Result(
+                data=results,
+                error=_batch_error('configure boot options', errors))
+        return results
+
+
+def _get_introspection_data(inspector_client, node_uuid):
+    try:
+        return introspection.get_data(inspector_client, node_uuid)
+    except ironic_inspector_client.ClientError:
+        raise exception.RootDeviceDetectionError(
+            'No introspection data found for node %s, '
+            'root device cannot be detected' % node_uuid)
+    except AttributeError:
+        raise RuntimeError('Ironic inspector client version 1.2.0 or '
+                           'newer is required for detecting root device')
+
+
+def _detect_root_device(node_uuid, data, strategy, minimum_size):
+    """Pick the root device of a node from its introspection data.
+
+    :return: tuple of the root device hint, the new local_gb of the node and
+             the chosen disk.
+    :raises: RootDeviceDetectionError if no suitable disk can be found.
+    """
+    try:
+        disks = data['inventory']['disks']
+    except KeyError:
+        raise exception.RootDeviceDetectionError(
+            'Malformed introspection data for node %s: '
+            'disks list is missing' % node_uuid)
+
+    minimum_size *= units.Gi
+    disks = [d for d in disks if d.get('size', 0) >= minimum_size]
+
+    if not disks:
+        raise exception.RootDeviceDetectionError(
+            'No suitable disks found for node %s' % node_uuid)
+
+    if strategy == 'smallest':
+        disks.sort(key=lambda d: d['size'])
+        root_device = disks[0]
+    elif strategy == 'largest':
+        disks.sort(key=lambda d: d['size'], reverse=True)
+        root_device = disks[0]
+    else:
+        disk_names = [x.strip() for x in strategy.split(',')]
+        disks = {d['name']: d for d in disks}
+        for candidate in disk_names:
+            try:
+                root_device = disks['/dev/%s' % candidate]
+            except KeyError:
+                continue
+            else:
+                break
+        else:
+            raise exception.RootDeviceDetectionError(
+                'Cannot find a disk with any of names %(strategy)s '
+                'for node %(node)s' %
+                {'strategy': strategy, 'node': node_uuid})
+
+    hint = None
+    for hint_name in ('wwn', 'serial'):
+        if root_device.get(hint_name):
+            hint = {hint_name: root_device[hint_name]}
+            break
+
+    if hint is None:
+        # I don't think it might actually happen, but just in case
+        raise exception.RootDeviceDetectionError(
+            'Neither WWN nor serial number are known for device %(dev)s '
+            'on node %(node)s; root device hints cannot be used' %
+            {'dev': root_device['name'], 'node': node_uuid})
+
+    # During the introspection process we got local_gb assigned according
+    # to the default strategy. Now we need to update it.
+    new_size = root_device['size'] / units.Gi
+    # This -1 is what we always do to account for partitioning
+    new_size -= 1
+
+    return hint, new_size, root_device
+
+
 class ConfigureRootDeviceAction(base.TripleOAction):
     """Configure the root device strategy.
 
@@ -165,10 +374,17 @@ class ConfigureRootDeviceAction(base.TripleOAction):
         baremetal_client = self._get_baremetal_client()
         node = baremetal_client.node.get(self.node_uuid)
         self._apply_root_device_strategy(
-            node, self.root_device, self.minimum_size, self.overwrite)
+            node, self.root_device, self.minimum_size, self.overwrite,
+            baremetal_client=baremetal_client)
 
     def _apply_root_device_strategy(self, node, strategy, minimum_size,
-                                    overwrite=False):
+                                    overwrite=False, baremetal_client=None,
+                                    inspector_client=None):
+        """Detect and set the root device of a node.
+
+        :return: False if the node already had root device hints and was
+                 skipped, True otherwise.
+        """
         if node.properties.get('root_device') and not overwrite:
             # This is a correct situation, we still want to allow people to
             # fine-tune the root device setting for a subset of nodes.
@@ -180,76 +396,17 @@ class ConfigureRootDeviceAction(base.TripleOAction):
             LOG.warning('You may unset them by running $ ironic '
                         'node-update %s remove properties/root_device',
                         node.uuid)
-            return
+            return False
 
-        inspector_client = self._get_baremetal_introspection_client()
-        try:
-            data = inspector_client.get_data(node.uuid)
-        except ironic_inspector_client.ClientError:
-            raise exception.RootDeviceDetectionError(
-                'No introspection data found for node %s, '
-                'root device cannot be detected' % node.uuid)
-        except AttributeError:
-            raise RuntimeError('Ironic inspector client version 1.2.0 or '
-                               'newer is required for detecting root device')
-
-        try:
-            disks = data['inventory']['disks']
-        except KeyError:
-            raise exception.RootDeviceDetectionError(
-                'Malformed introspection data for node %s: '
-                'disks list is missing' % node.uuid)
-
-        minimum_size *= units.Gi
-        disks = [d for d in disks if d.get('size', 0) >= minimum_size]
+        if inspector_client is None:
+            inspector_client = self._get_baremetal_introspection_client()
+        data = _get_introspection_data(inspector_client, node.uuid)
+        hint, new_size, root_device = _detect_root_device(
+            node.uuid, data, strategy, minimum_size)
 
-        if not disks:
-            raise exception.RootDeviceDetectionError(
-                'No suitable disks found for node %s' % node.uuid)
-
-        if strategy == 'smallest':
-            disks.sort(key=lambda d: d['size'])
-            root_device = disks[0]
-        elif strategy == 'largest':
-            disks.sort(key=lambda d: d['size'], reverse=True)
-            root_device = disks[0]
-        else:
-            disk_names = [x.strip() for x in strategy.split(',')]
-            disks = {d['name']: d for d in disks}
-            for candidate in disk_names:
-                try:
-                    root_device = disks['/dev/%s' % candidate]
-                except KeyError:
-                    continue
-                else:
-                    break
-            else:
-                raise exception.RootDeviceDetectionError(
-                    'Cannot find a disk with any of names %(strategy)s '
-                    'for node %(node)s' %
-                    {'strategy': strategy, 'node': node.uuid})
-
-        hint = None
-        for hint_name in ('wwn', 'serial'):
-            if root_device.get(hint_name):
-                hint = {hint_name: root_device[hint_name]}
-                break
-
-        if hint is None:
-            # I don't think it might actually happen, but just in case
-            raise exception.RootDeviceDetectionError(
-                'Neither WWN nor serial number are known for device %(dev)s '
-                'on node %(node)s; root device hints cannot be used' %
-                {'dev': root_device['name'], 'node': node.uuid})
-
-        # During the introspection process we got local_gb assigned according
-        # to the default strategy. Now we need to update it.
-        new_size = root_device['size'] / units.Gi
-        # This -1 is what we always do to account for partitioning
-        new_size -= 1
-
-        bm_client = self._get_baremetal_client()
-        bm_client.node.update(
+        if baremetal_client is None:
+            baremetal_client = self._get_baremetal_client()
+        baremetal_client.node.update(
             node.uuid,
             [{'op': 'add', 'path': '/properties/root_device', 'value': hint},
              {'op': 'add', 'path': '/properties/local_gb', 'value': new_size}])
@@ -257,6 +414,72 @@ class ConfigureRootDeviceAction(base.TripleOAction):
         LOG.info('Updated root device for node %(node)s, new device '
                  'is %(dev)s, new local_gb is %(local_gb)d',
                  {'node': node.uuid, 'dev': root_device, 'local_gb': new_size})
+        return True
+
+
+class ConfigureRootDeviceNodesAction(ConfigureRootDeviceAction):
+    """Configure the root device of many nodes at once.
+
+    All the nodes are fetched with a single listing, then their introspection
+    data is fetched and their root device set concurrently, using one Ironic
+    and one ironic-inspector client.
+
+    :param node_uuids: list of Ironic node UUIDs
+    :param root_device: Define the root device for nodes. Can be either a list
+                        of device names (without /dev) to choose from or one
+                        of two strategies: largest or smallest. For it to work
+                        this command should be run after the introspection.
+    :param minimum_size: Minimum size (in GiB) of the detected root device.
+    :param overwrite: Whether to overwrite existing root device hints when
+                      root-device is set.
+    :param concurrency: How many nodes to process at the same time.
+    :return: dictionary with the lists of 'configured' and 'skipped' node
+             UUIDs, and a 'failed' dictionary mapping node UUIDs to errors.
+    """
+
+    baremetal_retry_policy = _BATCH_RETRY_POLICY
+
+    def __init__(self, node_uuids, root_device=None, minimum_size=4,
+                 overwrite=False, concurrency=1):
+        super(ConfigureRootDeviceNodesAction, self).__init__(
+            None, root_device=root_device, minimum_size=minimum_size,
+            overwrite=overwrite)
+        self.node_uuids = node_uuids
+        self.concurrency = concurrency
+
+    def run(self):
+        if not self.root_device:
+            return
+
+        def _configure(node):
+            return self._apply_root_device_strategy(
+                node, self.root_device, self.minimum_size, self.overwrite,
+                baremetal_client=baremetal_client,
+                inspector_client=inspector_client)
+
+        try:
+            baremetal_client = self._get_baremetal_client()
+            inspector_client = self._get_baremetal_introspection_client()
+            configured, errors = nodes.run_on_nodes(
+                baremetal_client, self.node_uuids, _configure,
+                'configure root device', concurrency=self.concurrency)
+        except Exception as err:
+            LOG.exception("Error listing nodes for root device detection.")
+            return mistral_workflow_utils.Result("", err)
+
+        results = {
+            'configured': [node_uuid for node_uuid in self.node_uuids
+                           if configured.get(node_uuid)],
+            'skipped': [node_uuid for node_uuid in self.node_uuids
+                        if node_uuid in configured and
+                        not configured[node_uuid]],
+            'failed': errors,
+        }
+        if errors:
+            return mistral_workflow_utils.Result(
+                data=results,
+                error=_batch_error('configure root device', errors))
+        return results
 
 
 class UpdateNodeCapability(base.TripleOAction):
@@ -290,3 +513,72 @@ class UpdateNodeCapability(base.TripleOAction):
                 "",
                 "%s: %s" % (type(err).__name__, str(err))
             )
+
+
+class UpdateNodeCapabilities(base.TripleOAction):
+    """Update the capabilities of many nodes
+
+    The nodes are updated concurrently, then the parameters of the role
+    are updated once.
+
+    :param node_uuids: The UUIDs of the nodes
+    :param capabilities: Dictionary of the capabilities to set
+    :param role: The role whose parameters are updated afterwards. Defaults
+                 to the profile set in capabilities, if any.
+    :param container: The name of the plan
+    :param concurrency: How many nodes to update at the same time
+    :return: dictionary with 'nodes', mapping every node UUID to None on
+             success or to an error message, 'role', the role whose
+             parameters were updated (or None), and 'parameters', the
+             parameters set for this role.
+    """
+
+    baremetal_retry_policy = _BATCH_RETRY_POLICY
+
+    def __init__(self, node_uuids, capabilities, role=None,
+                 container=constants.DEFAULT_CONTAINER_NAME, concurrency=1):
+        super(UpdateNodeCapabilities, self).__init__()
+        self.node_uuids = node_uuids
+        self.capabilities = capabilities
+        self.role = role
+        self.container = container
+        self.concurrency = concurrency
+
+    def run(self):
+        baremetal_client = self._get_baremetal_client()
+
+        try:
+            results = nodes.update_nodes_capabilities(
+                self.node_uuids, self.capabilities, baremetal_client,
+                concurrency=self.concurrency)
+        except Exception as err:
+            LOG.exception("Error updating node capabilities in ironic.")
+            return mistral_workflow_utils.Result(
+                "",
+                "%s: %s" % (type(err).__name__, str(err))
+            )
+
+        role = self.role or self.capabilities.get('profile')
+        result = {'nodes': results, 'role': None, 'parameters': None}
+        errors = {uuid: err for uuid, err in results.items() if err}
+        if errors:
+            return mistral_workflow_utils.Result(
+                data=result,
+                error=_batch_error('update the capabilities', errors))
+
+        if role:
+            update_action = parameters.UpdateRoleParametersAction(
+                role, container=self.container)
+            try:
+                update_action.run()
+            except Exception as err:
+                LOG.exception("Error updating the parameters of role %s.",
+                              role)
+                return mistral_workflow_utils.Result(
+                    data=result,
+                    error="Capabilities of %d node(s) updated, but failed to "
+                          "update the parameters of role %s: %s" %
+                          (len(results), role, err))
+            result['role'] = role
+            result['parameters'] = update_action.parameters
+        return result
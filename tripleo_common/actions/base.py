@@ -12,6 +12,8 @@
 # WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
 # License for the specific language governing permissions and limitations
 # under the License.
+import threading
+
 from glanceclient.v2 import client as glanceclient
 from heatclient.v1 import client as heatclient
 import ironic_inspector_client
@@ -23,15 +25,48 @@ from mistralclient.api import client as mistral_client
 from novaclient.client import Client as nova_client
 from swiftclient import client as swift_client
 
+from tripleo_common.utils import client_pool
+from tripleo_common.utils import endpoints
+from tripleo_common.utils import retries
+
 
 class TripleOAction(base.Action):
 
+    #: The retry policy of the Ironic calls, or None to use the default one
+    baremetal_retry_policy = None
+
     def __init__(self):
         super(TripleOAction, self).__init__()
 
-    def _get_object_client(self):
+    def _get_pooled_client(self, service, factory, thread_safe=True):
+        """Return a client from the pool, creating it if needed.
+
+        Clients are shared by all the actions run by the same user in the
+        same project with the same token, so that their HTTP sessions and
+        connections are reused. They are dropped from the pool before the
+        token expires.
+
+        :param service: The name of the service.
+        :param factory: Callable creating the client from the context.
+        :param thread_safe: Whether the client can be shared by several
+                            threads; if not, every thread gets its own one.
+        """
         ctx = context.ctx()
-        obj_ep = keystone_utils.get_endpoint_for_project('swift')
+        key = (service, ctx.project_id, ctx.auth_token)
+        if not thread_safe:
+            key += (threading.current_thread().ident,)
+        return client_pool.get_pool().get(
+            key, lambda: factory(ctx),
+            expires_at=client_pool.token_expiry(
+                getattr(ctx, 'expires_at', None)))
+
+    def _get_object_client(self):
+        # A swiftclient Connection holds a single HTTP connection
+        return self._get_pooled_client('swift', self._create_object_client,
+                                       thread_safe=False)
+
+    def _create_object_client(self, ctx):
+        obj_ep = endpoints.get_endpoint_for_project('swift', ctx)
 
         kwargs = {
             'preauthurl': obj_ep.url % {'tenant_id': ctx.project_id},
@@ -41,9 +76,18 @@ class TripleOAction(base.Action):
         return swift_client.Connection(**kwargs)
 
     def _get_baremetal_client(self):
-        ctx = context.ctx()
+        """Return an Ironic client following the retry policy of the action.
 
-        ironic_endpoint = keystone_utils.get_endpoint_for_project('ironic')
+        The retry policy is the baremetal_retry_policy attribute of the
+        action, or retries.default_policy if it is not set.
+        """
+        client = self._get_pooled_client('ironic',
+                                         self._create_baremetal_client)
+        return retries.RetryingIronicClient(client,
+                                            self.baremetal_retry_policy)
+
+    def _create_baremetal_client(self, ctx):
+        ironic_endpoint = endpoints.get_endpoint_for_project('ironic', ctx)
 
         # FIXME(lucasagomes): Use ironicclient.get_client() instead
         # of ironicclient.Client(). Client() might cause errors since
@@ -54,20 +98,17 @@ class TripleOAction(base.Action):
             token=ctx.auth_token,
             region_name=ironic_endpoint.region,
             os_ironic_api_version='1.11',
-            # FIXME(lucasagomes):Paramtetize max_retries and
-            # max_interval. At the moment since we are dealing with
-            # a critical bug (#1612622) let's just hardcode the times
-            # here since the right fix does involve multiple projects
-            # (tripleo-ci and python-tripleoclient beyong tripleo-common)
-            max_retries=12,
-            retry_interval=5,
+            # Retries are handled by the RetryingIronicClient wrapper
+            max_retries=0,
         )
 
     def _get_baremetal_introspection_client(self):
-        ctx = context.ctx()
+        return self._get_pooled_client(
+            'ironic-inspector', self._create_baremetal_introspection_client)
 
-        bmi_endpoint = keystone_utils.get_endpoint_for_project(
-            'ironic-inspector')
+    def _create_baremetal_introspection_client(self, ctx):
+        bmi_endpoint = endpoints.get_endpoint_for_project(
+            'ironic-inspector', ctx)
 
         return ironic_inspector_client.ClientV1(
             api_version='1.2',
@@ -77,9 +118,10 @@ class TripleOAction(base.Action):
         )
 
     def _get_image_client(self):
-        ctx = context.ctx()
+        return self._get_pooled_client('glance', self._create_image_client)
 
-        glance_endpoint = keystone_utils.get_endpoint_for_project('glance')
+    def _create_image_client(self, ctx):
+        glance_endpoint = endpoints.get_endpoint_for_project('glance', ctx)
         return glanceclient.Client(
             glance_endpoint.url,
             token=ctx.auth_token,
@@ -87,8 +129,11 @@ class TripleOAction(base.Action):
         )
 
     def _get_orchestration_client(self):
-        ctx = context.ctx()
-        heat_endpoint = keystone_utils.get_endpoint_for_project('heat')
+        return self._get_pooled_client('heat',
+                                       self._create_orchestration_client)
+
+    def _create_orchestration_client(self, ctx):
+        heat_endpoint = endpoints.get_endpoint_for_project('heat', ctx)
 
         endpoint_url = keystone_utils.format_url(
             heat_endpoint.url,
@@ -103,8 +148,11 @@ class TripleOAction(base.Action):
         )
 
     def _get_workflow_client(self):
-        ctx = context.ctx()
-        mistral_endpoint = keystone_utils.get_endpoint_for_project('mistral')
+        return self._get_pooled_client('mistral',
+                                       self._create_workflow_client)
+
+    def _create_workflow_client(self, ctx):
+        mistral_endpoint = endpoints.get_endpoint_for_project('mistral', ctx)
 
         mc = mistral_client.client(auth_token=ctx.auth_token,
                                    mistral_url=mistral_endpoint.url)
@@ -112,9 +160,12 @@ class TripleOAction(base.Action):
         return mc
 
     def _get_compute_client(self):
-        ctx = context.ctx()
-        keystone_endpoint = keystone_utils.get_endpoint_for_project('keystone')
-        nova_endpoint = keystone_utils.get_endpoint_for_project('nova')
+        return self._get_pooled_client('nova', self._create_compute_client)
+
+    def _create_compute_client(self, ctx):
+        keystone_endpoint = endpoints.get_endpoint_for_project('keystone',
+                                                               ctx)
+        nova_endpoint = endpoints.get_endpoint_for_project('nova', ctx)
 
         nc = nova_client(2, username=ctx.user_name, auth_token=ctx.auth_token,
                          auth_url=keystone_endpoint.url, url=nova_endpoint.url,
@@ -23,6 +23,7 @@ from mistral.workflow import utils as mistral_workflow_utils
 from tripleo_common.actions import base
 from tripleo_common.actions import templates
 from tripleo_common import constants
+from tripleo_common.utils import waiter as waiter_utils
 
 LOG = logging.getLogger(__name__)
 
@@ -63,20 +64,24 @@ class OrchestrationDeployAction(base.TripleOAction):
         )
 
     def _wait_for_data(self, container_name, object_name):
-        body = None
-        count_check = 0
+        bodies = []
         swift_client = self._get_object_client()
-        while not body:
+
+        def _has_data():
             headers, body = swift_client.get_object(
                 container_name,
                 object_name
             )
-            count_check += 3
-            if body or count_check > self.timeout:
-                break
-            time.sleep(3)
+            bodies.append(body)
+            return body
+
+        waiter = waiter_utils.Waiter(timeout=self.timeout, delay=1,
+                                     max_delay=5)
+        waiter.wait(_has_data)
+        LOG.debug('Waited for deployment data of %s with %d polls',
+                  self.name, waiter.polls)
 
-        return body
+        return bodies[-1]
 
     def run(self):
         heat = self._get_orchestration_client()
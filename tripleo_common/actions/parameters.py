@@ -28,6 +28,9 @@
 # under the License.
 import logging
 
+from swiftclient import exceptions as swiftexceptions
+import yaml
+
 from tripleo_common.actions import base
 from tripleo_common.actions import templates
 from tripleo_common import constants
@@ -110,8 +113,9 @@ class UpdateParametersAction(base.TripleOAction):
 class UpdateRoleParametersAction(UpdateParametersAction):
     """Updates role related parameters in Mistral Environment ."""
 
-    def __init__(self, role):
-        super(UpdateRoleParametersAction, self).__init__(parameters=None)
+    def __init__(self, role, container=constants.DEFAULT_CONTAINER_NAME):
+        super(UpdateRoleParametersAction, self).__init__(parameters=None,
+                                                         container=container)
         self.role = role
 
     def run(self):
@@ -120,3 +124,41 @@ class UpdateRoleParametersAction(UpdateParametersAction):
         self.parameters = parameters.set_count_and_flavor_params(
             self.role, baremetal_client, compute_client)
         return super(UpdateRoleParametersAction, self).run()
+
+
+class UpdateRolesParametersAction(UpdateParametersAction):
+    """Updates the parameters of many roles in Mistral Environment.
+
+    The count and flavor of all the roles are computed from a single node
+    listing and a single flavor listing, then written in one environment
+    update.
+
+    :param roles: The roles to update, defaults to the roles of the plan
+                  (from its roles_data.yaml) or to all the known roles.
+    :param container: The name of the plan.
+    """
+
+    def __init__(self, roles=None,
+                 container=constants.DEFAULT_CONTAINER_NAME):
+        super(UpdateRolesParametersAction, self).__init__(
+            parameters=None, container=container)
+        self.roles = roles
+
+    def _get_plan_roles(self):
+        swift = self._get_object_client()
+        try:
+            role_data = yaml.safe_load(swift.get_object(
+                self.container, constants.OVERCLOUD_J2_ROLES_NAME)[1])
+        except swiftexceptions.ClientException:
+            LOG.info("No %s file found, updating all the roles",
+                     constants.OVERCLOUD_J2_ROLES_NAME)
+            return None
+        return parameters.get_roles_from_role_data(role_data) or None
+
+    def run(self):
+        roles = self.roles or self._get_plan_roles()
+        baremetal_client = self._get_baremetal_client()
+        compute_client = self._get_compute_client()
+        self.parameters = parameters.get_count_and_flavor_params(
+            baremetal_client, compute_client, roles=roles)
+        return super(UpdateRolesParametersAction, self).run()
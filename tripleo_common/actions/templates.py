@@ -16,7 +16,6 @@ import jinja2
 import json
 import logging
 import os
-import requests
 import six
 import tempfile as tf
 import yaml
@@ -28,7 +27,9 @@ from swiftclient import exceptions as swiftexceptions
 
 from tripleo_common.actions import base
 from tripleo_common import constants
+from tripleo_common.utils import swift_cache
 from tripleo_common.utils import tarball
+from tripleo_common.utils import template_files as template_files_utils
 
 LOG = logging.getLogger(__name__)
 
@@ -70,9 +71,12 @@ class ProcessTemplatesAction(base.TripleOAction):
 
     def _process_custom_roles(self):
         swift = self._get_object_client()
+        cache = swift_cache.get_cache()
+        project = context.ctx().project_id
         try:
-            j2_role_file = swift.get_object(
-                self.container, constants.OVERCLOUD_J2_ROLES_NAME)[1]
+            j2_role_file = cache.get_object(
+                swift, self.container, constants.OVERCLOUD_J2_ROLES_NAME,
+                project=project)
             role_data = yaml.safe_load(j2_role_file)
         except swiftexceptions.ClientException:
             LOG.info("No %s file found, skipping jinja templating"
@@ -93,7 +97,8 @@ class ProcessTemplatesAction(base.TripleOAction):
             # if it is, get it and template for roles
             if f.endswith('.j2.yaml'):
                 LOG.info("jinja2 rendering %s" % f)
-                j2_template = swift.get_object(self.container, f)[1]
+                j2_template = cache.get_object(swift, self.container, f,
+                                               project=project)
 
                 try:
                     # Render the j2 template
@@ -173,9 +178,21 @@ class ProcessTemplatesAction(base.TripleOAction):
                 LOG.debug('_env_path_is_object %s: %s' % (env_path, retval))
                 return retval
 
+            # Download the plan files concurrently before template_utils
+            # walks through them one at a time
+            cache = swift_cache.get_cache()
+            prefetched = template_files_utils.prefetch(
+                [template_object],
+                [path for path in env_paths if _env_path_is_object(path)],
+                lambda url: cache.request('GET', url, ctx.auth_token,
+                                          project=ctx.project_id),
+                url_filter=lambda url: url.startswith(swift.url))
+
             def _object_request(method, url, token=ctx.auth_token):
-                return requests.request(
-                    method, url, headers={'X-Auth-Token': token}).content
+                if method == 'GET' and url in prefetched:
+                    return prefetched[url]
+                return cache.request(method, url, token,
+                                     project=ctx.project_id)
 
             template_files, template = template_utils.get_template_contents(
                 template_object=template_object,
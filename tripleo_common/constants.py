@@ -33,6 +33,32 @@ UPDATE_RESOURCE_NAME = 'UpdateDeployment'
 #: The default timeout to pass to Heat stacks
 STACK_TIMEOUT_DEFAULT = 240
 
+#: The default time (in seconds) to wait for an Ironic node to reach a
+#: provision state
+PROVISION_STATE_TIMEOUT_DEFAULT = 300
+
+#: The directory where introspection data is cached, or None for the
+#: default one, see tripleo_common.utils.disk_cache.PrivateDirectory
+INTROSPECTION_DATA_CACHE_DIR = None
+
+#: The maximum size (in bytes) of the cached introspection data
+INTROSPECTION_DATA_CACHE_SIZE = 256 * 1024 * 1024
+
+#: The directory where plan files from Swift are cached, or None for the
+#: default one, see tripleo_common.utils.disk_cache.PrivateDirectory
+PLAN_CACHE_DIR = None
+
+#: The maximum size (in bytes) of the cached plan files
+PLAN_CACHE_SIZE = 128 * 1024 * 1024
+
+#: The maximum number of HTTP connections kept open to Swift to download
+#: the plan files
+PLAN_HTTP_POOL_SIZE = 8
+
+#: How many plan files are downloaded at the same time when processing the
+#: templates of a plan
+PLAN_PREFETCH_CONCURRENCY = 8
+
 #: The default name to use for a plan container
 DEFAULT_CONTAINER_NAME = 'overcloud'
 
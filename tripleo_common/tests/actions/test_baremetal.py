@@ -22,6 +22,49 @@ from tripleo_common import exception
 from tripleo_common.tests import base
 
 
+class TestValidateNodes(base.TestCase):
+
+    def test_run_nodes_json(self):
+        action = baremetal.ValidateNodes(
+            nodes_json=[{'pm_type': 'fake_pxe'}])
+        self.assertIsNone(action.run())
+
+    def test_run_invalid(self):
+        action = baremetal.ValidateNodes(
+            nodes_json=[{'pm_type': 'fake_pxe'}, {'pm_type': 'foobar'},
+                        {'name': 'node2'}])
+        result = action.run()
+        self.assertIn('2 invalid node(s) found', result.error)
+        self.assertIn('node 1: ', result.error)
+        self.assertIn('node 2 (node2): ', result.error)
+
+    @mock.patch('tripleo_common.actions.base.TripleOAction.'
+                '_get_object_client')
+    def test_run_swift(self, get_obj_client_mock):
+        swift = mock.MagicMock()
+        swift.get_object.return_value = (
+            {}, iter([b'{"nodes": [{"pm_t', b'ype": "foobar"}]}']))
+        get_obj_client_mock.return_value = swift
+
+        action = baremetal.ValidateNodes(container='overcloud')
+        result = action.run()
+
+        swift.get_object.assert_called_once_with(
+            'overcloud', 'instackenv.json', resp_chunk_size=units.Mi)
+        self.assertIn('unknown pm_type', result.error)
+
+    @mock.patch('tripleo_common.actions.base.TripleOAction.'
+                '_get_object_client')
+    def test_run_swift_malformed(self, get_obj_client_mock):
+        swift = mock.MagicMock()
+        swift.get_object.return_value = ({}, iter([b'{"nodes": [{']))
+        get_obj_client_mock.return_value = swift
+
+        action = baremetal.ValidateNodes(container='overcloud')
+        result = action.run()
+        self.assertIn('Expecting property name', result.error)
+
+
 class TestConfigureBootAction(base.TestCase):
 
     def setUp(self):
@@ -140,6 +183,80 @@ class TestConfigureBootAction(base.TestCase):
         self.assertIn("Update error", str(result.error))
 
 
+class TestConfigureBootNodesAction(base.TestCase):
+
+    def setUp(self):
+        super(TestConfigureBootNodesAction, self).setUp()
+        self.ironic = mock.MagicMock()
+        ironic_patcher = mock.patch(
+            'tripleo_common.actions.base.TripleOAction._get_baremetal_client',
+            return_value=self.ironic)
+        self.mock_ironic = ironic_patcher.start()
+        self.addCleanup(ironic_patcher.stop)
+
+        self.glance = mock.MagicMock()
+        glance_patcher = mock.patch(
+            'tripleo_common.actions.base.TripleOAction._get_image_client',
+            return_value=self.glance)
+        self.mock_glance = glance_patcher.start()
+        self.addCleanup(glance_patcher.stop)
+
+        self.glance.images.find.side_effect = (mock.MagicMock(id='k_id'),
+                                               mock.MagicMock(id='r_id'))
+        self.ironic.node.list.return_value = [
+            mock.MagicMock(uuid='uuid1', properties={}),
+            mock.MagicMock(uuid='uuid2',
+                           properties={'capabilities': 'profile:compute'}),
+            mock.MagicMock(uuid='other', properties={}),
+        ]
+
+    def _patch(self, capabilities):
+        return [{'op': 'add', 'path': '/properties/capabilities',
+                 'value': capabilities},
+                {'op': 'add', 'path': '/driver_info/deploy_ramdisk',
+                 'value': 'r_id'},
+                {'op': 'add', 'path': '/driver_info/deploy_kernel',
+                 'value': 'k_id'}]
+
+    def test_run(self):
+        action = baremetal.ConfigureBootNodesAction(
+            node_uuids=['uuid1', 'uuid2'], concurrency=2)
+        result = action.run()
+
+        self.assertEqual({'uuid1': None, 'uuid2': None}, result)
+        self.assertEqual(2, self.glance.images.find.call_count)
+        self.ironic.node.list.assert_called_once_with(
+            fields=['uuid', 'properties'], limit=0)
+        self.ironic.node.get.assert_not_called()
+        self.assertEqual(2, self.ironic.node.update.call_count)
+        self.ironic.node.update.assert_any_call(
+            'uuid1', self._patch('boot_option:local'))
+        self.ironic.node.update.assert_any_call(
+            'uuid2', self._patch('profile:compute,boot_option:local'))
+
+    def test_run_partial_failure(self):
+        self.ironic.node.update.side_effect = [None, RuntimeError('boom')]
+        action = baremetal.ConfigureBootNodesAction(
+            node_uuids=['uuid1', 'uuid2', 'missing'])
+        result = action.run()
+
+        self.assertEqual({'uuid1': None, 'uuid2': 'boom',
+                          'missing': 'Node missing not found in Ironic'},
+                         result.data)
+        self.assertIn('Failed to configure boot options of 2 node(s)',
+                      result.error)
+        self.assertEqual(2, self.ironic.node.update.call_count)
+
+    def test_run_glance_ids_not_found(self):
+        self.glance.images.find.side_effect = glance_exceptions.NotFound
+        action = baremetal.ConfigureBootNodesAction(
+            node_uuids=['uuid1'], kernel_name='unknown_kernel',
+            ramdisk_name='unknown_ramdisk')
+        result = action.run()
+        self.assertIn("not found", str(result.error))
+        self.ironic.node.update.assert_not_called()
+
+
 class TestConfigureRootDeviceAction(base.TestCase):
 
     def setUp(self):
@@ -330,3 +447,162 @@ class TestConfigureRootDeviceAction(base.TestCase):
                                 "Cannot find a disk",
                                 action.run)
         self.assertEqual(self.ironic.node.update.call_count, 0)
+
+    def test_one_baremetal_client(self):
+        action = baremetal.ConfigureRootDeviceAction(node_uuid='MOCK_UUID',
+                                                     root_device='smallest')
+        action.run()
+        self.assertEqual(1, self.mock_ironic.call_count)
+
+
+class TestConfigureRootDeviceNodesAction(base.TestCase):
+
+    def setUp(self):
+        super(TestConfigureRootDeviceNodesAction, self).setUp()
+        self.disks = [
+            {'name': '/dev/sda', 'size': 11 * units.Gi, 'wwn': 'wwn0'},
+            {'name': '/dev/sdb', 'size': 21 * units.Gi, 'wwn': 'wwn1'},
+        ]
+
+        self.ironic = mock.MagicMock()
+        ironic_patcher = mock.patch(
+            'tripleo_common.actions.base.TripleOAction._get_baremetal_client',
+            return_value=self.ironic)
+        self.mock_ironic = ironic_patcher.start()
+        self.addCleanup(ironic_patcher.stop)
+
+        self.inspector = mock.MagicMock()
+        inspector_patcher = mock.patch(
+            'tripleo_common.actions.base.TripleOAction.'
+            '_get_baremetal_introspection_client',
+            return_value=self.inspector)
+        self.mock_inspector = inspector_patcher.start()
+        self.addCleanup(inspector_patcher.stop)
+
+        self.ironic.node.list.return_value = [
+            mock.Mock(uuid='uuid1', properties={}),
+            mock.Mock(uuid='uuid2', properties={'root_device': {'wwn': 'x'}}),
+            mock.Mock(uuid='uuid3', properties={}),
+        ]
+
+        def get_data(node_uuid):
+            if node_uuid == 'uuid3':
+                raise ironic_inspector_client.ClientError(mock.Mock())
+            return {'inventory': {'disks': self.disks}}
+        self.inspector.get_data.side_effect = get_data
+
+    def test_batch(self):
+        action = baremetal.ConfigureRootDeviceNodesAction(
+            node_uuids=['uuid1', 'uuid2', 'uuid3', 'missing'],
+            root_device='largest', concurrency=4)
+        result = action.run()
+
+        self.assertEqual(['uuid1'], result.data['configured'])
+        self.assertEqual(['uuid2'], result.data['skipped'])
+        self.assertEqual(['missing', 'uuid3'],
+                         sorted(result.data['failed']))
+        self.assertIn('No introspection data found for node uuid3',
+                      result.data['failed']['uuid3'])
+        self.assertIn('Failed to configure root device of 2 node(s)',
+                      result.error)
+
+        self.ironic.node.list.assert_called_once_with(
+            fields=['uuid', 'properties'], limit=0)
+        self.ironic.node.get.assert_not_called()
+        self.ironic.node.update.assert_called_once_with(
+            'uuid1',
+            [{'op': 'add', 'path': '/properties/root_device',
+              'value': {'wwn': 'wwn1'}},
+             {'op': 'add', 'path': '/properties/local_gb', 'value': 20}])
+        self.assertEqual(2, self.inspector.get_data.call_count)
+        self.assertEqual(1, self.mock_ironic.call_count)
+        self.assertEqual(1, self.mock_inspector.call_count)
+
+    def test_batch_overwrite(self):
+        action = baremetal.ConfigureRootDeviceNodesAction(
+            node_uuids=['uuid1', 'uuid2'], root_device='smallest',
+            overwrite=True)
+        result = action.run()
+        self.assertEqual({'configured': ['uuid1', 'uuid2'], 'skipped': [],
+                          'failed': {}}, result)
+        self.assertEqual(2, self.ironic.node.update.call_count)
+
+    def test_batch_no_root_device(self):
+        action = baremetal.ConfigureRootDeviceNodesAction(
+            node_uuids=['uuid1'])
+        self.assertIsNone(action.run())
+        self.ironic.node.list.assert_not_called()
+
+
+class TestUpdateNodeCapabilities(base.TestCase):
+
+    def setUp(self):
+        super(TestUpdateNodeCapabilities, self).setUp()
+        self.ironic = mock.MagicMock()
+        ironic_patcher = mock.patch(
+            'tripleo_common.actions.base.TripleOAction._get_baremetal_client',
+            return_value=self.ironic)
+        self.mock_ironic = ironic_patcher.start()
+        self.addCleanup(ironic_patcher.stop)
+
+        self.ironic.node.list.return_value = [
+            mock.Mock(uuid='uuid1', properties={}),
+            mock.Mock(uuid='uuid2', properties={}),
+        ]
+
+    @mock.patch('tripleo_common.actions.parameters.'
+                'UpdateRoleParametersAction')
+    def test_run(self, mock_update_role):
+        action = baremetal.UpdateNodeCapabilities(
+            node_uuids=['uuid1', 'uuid2'], capabilities={'profile': 'compute'},
+            container='plan', concurrency=2)
+        result = action.run()
+
+        self.assertEqual({'nodes': {'uuid1': None, 'uuid2': None},
+                          'role': 'compute',
+                          'parameters':
+                              mock_update_role.return_value.parameters},
+                         result)
+        self.assertEqual(2, self.ironic.node.update.call_count)
+        mock_update_role.assert_called_once_with('compute', container='plan')
+        mock_update_role.return_value.run.assert_called_once_with()
+
+    @mock.patch('tripleo_common.actions.parameters.'
+                'UpdateRoleParametersAction')
+    def test_run_role_update_failure(self, mock_update_role):
+        mock_update_role.return_value.run.side_effect = RuntimeError('boom')
+        action = baremetal.UpdateNodeCapabilities(
+            node_uuids=['uuid1', 'uuid2'], capabilities={'profile': 'compute'})
+        result = action.run()
+
+        self.assertEqual({'nodes': {'uuid1': None, 'uuid2': None},
+                          'role': None, 'parameters': None}, result.data)
+        self.assertIn('failed to update the parameters of role compute: '
+                      'boom', result.error)
+        self.assertEqual(2, self.ironic.node.update.call_count)
+
+    @mock.patch('tripleo_common.actions.parameters.'
+                'UpdateRoleParametersAction')
+    def test_run_no_role(self, mock_update_role):
+        action = baremetal.UpdateNodeCapabilities(
+            node_uuids=['uuid1'], capabilities={'boot_option': 'local'})
+        result = action.run()
+
+        self.assertEqual({'nodes': {'uuid1': None}, 'role': None,
+                          'parameters': None}, result)
+        mock_update_role.assert_not_called()
+
+    @mock.patch('tripleo_common.actions.parameters.'
+                'UpdateRoleParametersAction')
+    def test_run_failure(self, mock_update_role):
+        action = baremetal.UpdateNodeCapabilities(
+            node_uuids=['uuid1', 'missing'],
+            capabilities={'profile': 'compute'})
+        result = action.run()
+
+        self.assertEqual({'uuid1': None,
+                          'missing': 'Node missing not found in Ironic'},
+                         result.data['nodes'])
+        self.assertIn('Failed to update the capabilities of 1 node(s)',
+                      result.error)
+        mock_update_role.assert_not_called()
@@ -12,6 +12,8 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+import threading
+
 import mock
 
 from ironicclient.v1 import client as ironicclient
@@ -20,6 +22,7 @@ from mistral.utils.openstack import keystone as keystone_utils
 
 from tripleo_common.actions import base
 from tripleo_common.tests import base as tests_base
+from tripleo_common.utils import retries
 
 
 @mock.patch.object(context, 'ctx')
@@ -34,9 +37,52 @@ class TestActionsBase(tests_base.TestCase):
     def test__get_baremetal_client(self, mock_client, mock_endpoint, mock_cxt):
         mock_endpoint.return_value = mock.Mock(
             url='http://ironic/v1', region='ironic-region')
-        self.action._get_baremetal_client()
+        client = self.action._get_baremetal_client()
         mock_client.assert_called_once_with(
-            'http://ironic/v1', max_retries=12, os_ironic_api_version='1.11',
-            region_name='ironic-region', retry_interval=5, token=mock.ANY)
+            'http://ironic/v1', max_retries=0, os_ironic_api_version='1.11',
+            region_name='ironic-region', token=mock.ANY)
+        self.assertIsInstance(client, retries.RetryingIronicClient)
         mock_endpoint.assert_called_once_with('ironic')
         mock_cxt.assert_called_once_with()
+
+    @mock.patch.object(ironicclient, 'Client')
+    def test__get_baremetal_client_pooled(self, mock_client, mock_endpoint,
+                                          mock_cxt):
+        mock_cxt.return_value = mock.Mock(project_id='project',
+                                          auth_token='token',
+                                          expires_at=None)
+        mock_client.side_effect = lambda *args, **kwargs: mock.Mock()
+        client = self.action._get_baremetal_client()._client
+        self.assertIs(client,
+                      base.TripleOAction()._get_baremetal_client()._client)
+        self.assertEqual(1, mock_client.call_count)
+        mock_endpoint.assert_called_once_with('ironic')
+
+        mock_cxt.return_value.auth_token = 'new-token'
+        self.assertIsNot(client, self.action._get_baremetal_client()._client)
+        self.assertEqual(2, mock_client.call_count)
+
+    @mock.patch('swiftclient.client.Connection')
+    def test__get_object_client_per_thread(self, mock_conn, mock_endpoint,
+                                           mock_cxt):
+        mock_cxt.return_value = mock.Mock(project_id='project',
+                                          auth_token='token',
+                                          expires_at=None)
+        mock_conn.side_effect = lambda **kwargs: mock.Mock()
+        client = self.action._get_object_client()
+        self.assertIs(client, self.action._get_object_client())
+
+        clients = []
+        thread = threading.Thread(
+            target=lambda: clients.append(self.action._get_object_client()))
+        thread.start()
+        thread.join()
+        self.assertIsNot(client, clients[0])
+
+    @mock.patch.object(ironicclient, 'Client')
+    def test__get_baremetal_client_retry_policy(self, mock_client,
+                                                mock_endpoint, mock_cxt):
+        policy = retries.RetryPolicy(max_retries=1)
+        self.action.baremetal_retry_policy = policy
+        client = self.action._get_baremetal_client()
+        self.assertIs(policy, client._policy)
@@ -68,8 +68,8 @@ class OrchestrationDeployActionTest(base.TestCase):
         swift.get_object.assert_called_once_with('container', 'object')
 
     @mock.patch('tripleo_common.actions.base.TripleOAction._get_object_client')
-    @mock.patch('time.sleep')
-    def test_wait_for_data_timeout(self, sleep, get_obj_client_mock):
+    def test_wait_for_data_timeout(self, get_obj_client_mock):
+        clock = self.use_fake_clock()
         swift = mock.MagicMock()
         swift.get_object.return_value = ({}, None)
         get_obj_client_mock.return_value = swift
@@ -77,11 +77,15 @@ class OrchestrationDeployActionTest(base.TestCase):
         action = deployment.OrchestrationDeployAction(self.server_id,
                                                       self.config, self.name,
                                                       timeout=10)
-        self.assertEqual(None, action._wait_for_data('container', 'object'))
+        with mock.patch('random.uniform', return_value=0):
+            self.assertEqual(None,
+                             action._wait_for_data('container', 'object'))
         get_obj_client_mock.assert_called_once()
         swift.get_object.assert_called_with('container', 'object')
-        # Trying every 3 seconds, so 4 times for a timeout of 10 seconds
-        self.assertEqual(swift.get_object.call_count, 4)
+        # Backing off from 1 to 5 seconds, the last poll happening right at
+        # the 10 seconds timeout
+        self.assertEqual([1, 2, 4, 3], clock.sleeps)
+        self.assertEqual(swift.get_object.call_count, 5)
 
     @mock.patch('tripleo_common.actions.base.TripleOAction._get_object_client')
     @mock.patch('tripleo_common.actions.base.TripleOAction.'
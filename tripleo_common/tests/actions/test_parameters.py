@@ -134,3 +134,102 @@ class UpdateParametersActionTest(base.TestCase):
                 'environments': [{u'path': u'environments/test.yaml'}],
                 'parameter_defaults': {'SomeTestParameter': 42}}
         )
+
+
+class UpdateRoleParametersActionTest(base.TestCase):
+
+    @mock.patch('tripleo_common.utils.parameters.'
+                'set_count_and_flavor_params')
+    @mock.patch('tripleo_common.actions.base.TripleOAction.'
+                '_get_compute_client')
+    @mock.patch('tripleo_common.actions.base.TripleOAction.'
+                '_get_baremetal_client')
+    @mock.patch('tripleo_common.actions.base.TripleOAction.'
+                '_get_workflow_client')
+    def test_run(self, mock_get_workflow_client, mock_get_baremetal_client,
+                 mock_get_compute_client, mock_set_count_and_flavor):
+        mock_mistral = mock.MagicMock()
+        mock_env = mock.MagicMock()
+        mock_env.name = 'plan'
+        mock_env.variables = {}
+        mock_mistral.environments.get.return_value = mock_env
+        mock_get_workflow_client.return_value = mock_mistral
+        mock_set_count_and_flavor.return_value = {'ComputeCount': 2}
+
+        action = parameters.UpdateRoleParametersAction('compute',
+                                                       container='plan')
+        action.run()
+
+        mock_set_count_and_flavor.assert_called_once_with(
+            'compute', mock_get_baremetal_client.return_value,
+            mock_get_compute_client.return_value)
+        mock_mistral.environments.get.assert_called_once_with('plan')
+        mock_mistral.environments.update.assert_called_once_with(
+            name='plan',
+            variables={'parameter_defaults': {'ComputeCount': 2}})
+
+
+class UpdateRolesParametersActionTest(base.TestCase):
+
+    def setUp(self):
+        super(UpdateRolesParametersActionTest, self).setUp()
+        self.mistral = mock.MagicMock()
+        self.env = mock.MagicMock()
+        self.env.name = 'plan'
+        self.env.variables = {'parameter_defaults': {'Foo': 'bar'}}
+        self.mistral.environments.get.return_value = self.env
+        self.swift = mock.MagicMock()
+
+        for name, client in (('workflow', self.mistral),
+                             ('object', self.swift),
+                             ('baremetal', mock.sentinel.baremetal),
+                             ('compute', mock.sentinel.compute)):
+            patcher = mock.patch(
+                'tripleo_common.actions.base.TripleOAction._get_%s_client'
+                % name, return_value=client)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        patcher = mock.patch('tripleo_common.utils.parameters.'
+                             'get_count_and_flavor_params',
+                             return_value={'ComputeCount': 2,
+                                           'ControllerCount': 1})
+        self.mock_params = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_run(self):
+        action = parameters.UpdateRolesParametersAction(
+            roles=['compute', 'control'], container='plan')
+        action.run()
+
+        self.mock_params.assert_called_once_with(
+            mock.sentinel.baremetal, mock.sentinel.compute,
+            roles=['compute', 'control'])
+        self.swift.get_object.assert_not_called()
+        self.mistral.environments.update.assert_called_once_with(
+            name='plan',
+            variables={'parameter_defaults': {'Foo': 'bar',
+                                              'ComputeCount': 2,
+                                              'ControllerCount': 1}})
+
+    def test_run_plan_roles(self):
+        self.swift.get_object.return_value = (
+            {}, '- name: Controller\n- name: Compute\n')
+        action = parameters.UpdateRolesParametersAction(container='plan')
+        action.run()
+
+        self.swift.get_object.assert_called_once_with(
+            'plan', constants.OVERCLOUD_J2_ROLES_NAME)
+        self.mock_params.assert_called_once_with(
+            mock.sentinel.baremetal, mock.sentinel.compute,
+            roles=['compute', 'control'])
+        self.assertEqual(1, self.mistral.environments.update.call_count)
+
+    def test_run_no_role_data(self):
+        self.swift.get_object.side_effect = swiftexceptions.ClientException(
+            'atest2')
+        action = parameters.UpdateRolesParametersAction(container='plan')
+        action.run()
+
+        self.mock_params.assert_called_once_with(
+            mock.sentinel.baremetal, mock.sentinel.compute, roles=None)
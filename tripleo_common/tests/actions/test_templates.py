@@ -79,6 +79,7 @@ class UploadTemplatesActionTest(base.TestCase):
 
 class ProcessTemplatesActionTest(base.TestCase):
 
+    @mock.patch('tripleo_common.utils.template_files.prefetch')
     @mock.patch('heatclient.common.template_utils.'
                 'process_multiple_environments_and_files')
     @mock.patch('heatclient.common.template_utils.get_template_contents')
@@ -88,7 +89,8 @@ class ProcessTemplatesActionTest(base.TestCase):
     @mock.patch('mistral.context.ctx')
     def test_run(self, mock_ctx, mock_get_object_client,
                  mock_get_workflow_client, mock_get_template_contents,
-                 mock_process_multiple_environments_and_files):
+                 mock_process_multiple_environments_and_files,
+                 mock_prefetch):
 
         mock_ctx.return_value = mock.MagicMock()
         swift = mock.MagicMock(url="http://test.com")
@@ -124,6 +126,10 @@ class ProcessTemplatesActionTest(base.TestCase):
                 'heat_template_version': '2016-04-30'
             }
         })
+        mock_prefetch.assert_called_once_with(
+            ['http://test.com/overcloud/template'],
+            ['http://test.com/overcloud/environments/test.yaml'],
+            mock.ANY, url_filter=mock.ANY)
 
     @mock.patch('tripleo_common.actions.base.TripleOAction._get_object_client')
     @mock.patch('mistral.context.ctx')
@@ -15,9 +15,59 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+import mock
 from oslotest import base
 
+from tripleo_common.utils import client_pool
+from tripleo_common.utils import endpoints
+from tripleo_common.utils import glance
+from tripleo_common.utils import parameters
+
+
+class FakeClock(object):
+    """A clock which only moves forward when sleeping.
+
+    The durations of the sleeps are recorded in the ``sleeps`` attribute.
+    """
+
+    def __init__(self):
+        self.now = 0
+        self.sleeps = []
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
 
 class TestCase(base.BaseTestCase):
 
     """Test case base class for all unit tests."""
+
+    def setUp(self):
+        super(TestCase, self).setUp()
+        # Do not leak the images, flavors, clients and endpoints of one
+        # test into another one
+        glance.clear_image_cache()
+        self.addCleanup(glance.clear_image_cache)
+        parameters.clear_flavor_cache()
+        self.addCleanup(parameters.clear_flavor_cache)
+        client_pool.get_pool().clear()
+        self.addCleanup(client_pool.get_pool().clear)
+        endpoints.get_cache().clear()
+        self.addCleanup(endpoints.get_cache().clear)
+
+    def use_fake_clock(self):
+        """Replace time.time and time.sleep with a FakeClock for this test.
+
+        :return: the FakeClock.
+        """
+        clock = FakeClock()
+        for name, func in (('time.time', clock.time),
+                           ('time.sleep', clock.sleep)):
+            patcher = mock.patch(name, side_effect=func)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        return clock
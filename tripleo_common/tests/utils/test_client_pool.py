@@ -0,0 +1,85 @@
+# Copyright 2016 Red Hat, Inc.
+# All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+import mock
+
+from tripleo_common.tests import base
+from tripleo_common.utils import client_pool
+
+
+class ClientPoolTest(base.TestCase):
+
+    def setUp(self):
+        super(ClientPoolTest, self).setUp()
+        self.pool = client_pool.ClientPool(max_size=2, ttl=100)
+        self.factory = mock.Mock(side_effect=lambda: mock.Mock())
+
+    def test_reuse(self):
+        client = self.pool.get('a', self.factory)
+        self.assertIs(client, self.pool.get('a', self.factory))
+        self.assertEqual(1, self.factory.call_count)
+
+    def test_different_keys(self):
+        self.assertIsNot(self.pool.get('a', self.factory),
+                         self.pool.get('b', self.factory))
+        self.assertEqual(2, self.factory.call_count)
+
+    def test_least_recently_used_dropped(self):
+        client_a = self.pool.get('a', self.factory)
+        self.pool.get('b', self.factory)
+        self.pool.get('a', self.factory)
+        self.pool.get('c', self.factory)
+
+        self.assertEqual(2, len(self.pool))
+        self.assertIs(client_a, self.pool.get('a', self.factory))
+        self.assertEqual(3, self.factory.call_count)
+        self.pool.get('b', self.factory)
+        self.assertEqual(4, self.factory.call_count)
+
+    @mock.patch('time.time')
+    def test_ttl(self, time_mock):
+        time_mock.return_value = 1000
+        client = self.pool.get('a', self.factory)
+        time_mock.return_value = 1099
+        self.assertIs(client, self.pool.get('a', self.factory))
+        time_mock.return_value = 1101
+        self.assertIsNot(client, self.pool.get('a', self.factory))
+
+    @mock.patch('time.time')
+    def test_token_expiry(self, time_mock):
+        time_mock.return_value = 1000
+        expires_at = 1000 + client_pool.TOKEN_EXPIRY_MARGIN + 10
+        client = self.pool.get('a', self.factory, expires_at=expires_at)
+        time_mock.return_value = 1009
+        self.assertIs(client, self.pool.get('a', self.factory))
+        time_mock.return_value = 1011
+        self.assertIsNot(client, self.pool.get('a', self.factory))
+
+    def test_token_about_to_expire_not_pooled(self):
+        self.pool.get('a', self.factory, expires_at=0)
+        self.assertEqual(0, len(self.pool))
+
+    def test_clear(self):
+        self.pool.get('a', self.factory)
+        self.pool.clear()
+        self.pool.get('a', self.factory)
+        self.assertEqual(2, self.factory.call_count)
+
+    def test_token_expiry_parsing(self):
+        self.assertEqual(86400,
+                         client_pool.token_expiry('1970-01-02T00:00:00Z'))
+        self.assertEqual(86400, client_pool.token_expiry(
+            '1970-01-02T01:00:00.000000+01:00'))
+        self.assertIsNone(client_pool.token_expiry(None))
+        self.assertIsNone(client_pool.token_expiry('garbage'))
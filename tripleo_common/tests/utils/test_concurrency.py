@@ -0,0 +1,42 @@
+# Copyright 2016 Red Hat, Inc.
+# All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+from tripleo_common.tests import base
+from tripleo_common.utils import concurrency
+
+
+class MapConcurrentlyTest(base.TestCase):
+
+    def test_serial(self):
+        futures = concurrency.map_concurrently(lambda x: x * 2, [1, 2, 3])
+        self.assertEqual([2, 4, 6], [f.result() for f in futures])
+
+    def test_concurrent_keeps_order(self):
+        futures = concurrency.map_concurrently(lambda x: x * 2,
+                                               range(20), concurrency=4)
+        self.assertEqual([x * 2 for x in range(20)],
+                         [f.result() for f in futures])
+
+    def test_exception_is_stored(self):
+        def func(x):
+            if x == 2:
+                raise ValueError(x)
+            return x
+
+        futures = concurrency.map_concurrently(func, [1, 2, 3],
+                                               concurrency=2)
+        self.assertEqual(1, futures[0].result())
+        self.assertIsInstance(futures[1].exception(), ValueError)
+        self.assertEqual(3, futures[2].result())
@@ -0,0 +1,68 @@
+# Copyright 2016 Red Hat, Inc.
+# All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+import os
+import shutil
+import tempfile
+
+import mock
+
+from tripleo_common.tests import base
+from tripleo_common.utils import disk_cache
+
+
+class PrivateDirectoryTest(base.TestCase):
+
+    def setUp(self):
+        super(PrivateDirectoryTest, self).setUp()
+        self.parent = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.parent)
+        self.path = os.path.join(self.parent, 'cache')
+
+    def test_created_private(self):
+        self.assertTrue(disk_cache.PrivateDirectory(self.path).available())
+        self.assertEqual(0o700, os.stat(self.path).st_mode & 0o777)
+
+    def test_existing_private(self):
+        os.mkdir(self.path, 0o700)
+        self.assertTrue(disk_cache.PrivateDirectory(self.path).available())
+
+    def test_accessible_to_others(self):
+        os.mkdir(self.path)
+        os.chmod(self.path, 0o755)
+        self.assertFalse(disk_cache.PrivateDirectory(self.path).available())
+
+    @mock.patch('os.geteuid', return_value=12345)
+    def test_owned_by_other_user(self, geteuid_mock):
+        os.mkdir(self.path, 0o700)
+        self.assertFalse(disk_cache.PrivateDirectory(self.path).available())
+
+    def test_symlink(self):
+        target = os.path.join(self.parent, 'target')
+        os.mkdir(target, 0o700)
+        os.symlink(target, self.path)
+        self.assertFalse(disk_cache.PrivateDirectory(self.path).available())
+
+    def test_checked_once(self):
+        directory = disk_cache.PrivateDirectory(self.path)
+        with mock.patch.object(disk_cache, 'ensure_private_directory') as m:
+            directory.available()
+            directory.available()
+        m.assert_called_once_with(self.path)
+
+    @mock.patch('os.geteuid', return_value=12345)
+    def test_default_directory(self, geteuid_mock):
+        self.assertEqual(
+            os.path.join(tempfile.gettempdir(), 'tripleo-plans-12345'),
+            disk_cache.default_directory('tripleo-plans'))
@@ -0,0 +1,76 @@
+# Copyright 2016 Red Hat, Inc.
+# All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+import mock
+
+from mistral.utils.openstack import keystone as keystone_utils
+
+from tripleo_common.tests import base
+from tripleo_common.utils import endpoints
+
+
+@mock.patch.object(keystone_utils, 'get_endpoint_for_project')
+class EndpointCacheTest(base.TestCase):
+
+    def setUp(self):
+        super(EndpointCacheTest, self).setUp()
+        self.cache = endpoints.EndpointCache(ttl=100)
+        self.ctx = mock.Mock(project_id='project', region_name=None)
+
+    def test_cached(self, mock_get_endpoint):
+        for _ in range(3):
+            endpoint = self.cache.get('ironic', self.ctx)
+        self.assertIs(mock_get_endpoint.return_value, endpoint)
+        mock_get_endpoint.assert_called_once_with('ironic')
+        self.assertEqual(2, self.cache.hits)
+        self.assertEqual(1, self.cache.misses)
+
+    def test_per_project_and_service(self, mock_get_endpoint):
+        self.cache.get('ironic', self.ctx)
+        self.cache.get('glance', self.ctx)
+        self.cache.get('ironic', mock.Mock(project_id='other',
+                                           region_name=None))
+        self.assertEqual(3, mock_get_endpoint.call_count)
+        self.assertEqual(0, self.cache.hits)
+        self.assertEqual(3, self.cache.misses)
+
+    @mock.patch('time.time')
+    def test_expired(self, time_mock, mock_get_endpoint):
+        time_mock.return_value = 1000
+        self.cache.get('ironic', self.ctx)
+        time_mock.return_value = 1101
+        self.cache.get('ironic', self.ctx)
+        self.assertEqual(2, mock_get_endpoint.call_count)
+
+    def test_errors_not_cached(self, mock_get_endpoint):
+        mock_get_endpoint.side_effect = [RuntimeError('no endpoint'),
+                                         mock.sentinel.endpoint]
+        self.assertRaises(RuntimeError, self.cache.get, 'ironic', self.ctx)
+        self.assertIs(mock.sentinel.endpoint,
+                      self.cache.get('ironic', self.ctx))
+
+    def test_clear(self, mock_get_endpoint):
+        self.cache.get('ironic', self.ctx)
+        self.cache.clear()
+        self.assertEqual(0, self.cache.misses)
+        self.cache.get('ironic', self.ctx)
+        self.assertEqual(2, mock_get_endpoint.call_count)
+
+    @mock.patch('mistral.context.ctx')
+    def test_current_context(self, mock_ctx, mock_get_endpoint):
+        mock_ctx.return_value = self.ctx
+        endpoints.get_endpoint_for_project('ironic')
+        endpoints.get_endpoint_for_project('ironic')
+        mock_get_endpoint.assert_called_once_with('ironic')
+        self.assertEqual(1, endpoints.get_cache().hits)
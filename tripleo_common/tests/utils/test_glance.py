@@ -14,9 +14,12 @@
 # limitations under the License.
 
 import collections
+import hashlib
 import tempfile
 
+from glanceclient.common import http as glance_http
 from glanceclient import exc as exceptions
+from glanceclient.v2.client import Client as real_glance_client
 import mock
 import testtools
 
@@ -98,3 +101,204 @@ class GlanceTest(base.TestCase):
                                    is_public=True, data=mock.ANY)
         client.images.create.assert_has_calls([kernel_create, ramdisk_create])
         self.assertEqual(expected, ids)
+
+    def _client(self, endpoint='http://glance', token='token'):
+        client = mock.MagicMock()
+        client.http_client = mock.Mock(spec=['endpoint', 'auth_token'],
+                                       endpoint=endpoint, auth_token=token)
+        return client
+
+    def test_images_cached(self):
+        client = self._client()
+        client.images.find.side_effect = (self.image('aaa'), self.image('zzz'))
+        expected = {'kernel': 'aaa', 'ramdisk': 'zzz'}
+        for _ in range(3):
+            ids = glance.create_or_find_kernel_and_ramdisk(
+                client, 'bm-kernel', 'bm-ramdisk')
+            self.assertEqual(expected, ids)
+        self.assertEqual(2, client.images.find.call_count)
+
+    def test_images_cached_per_endpoint_and_project(self):
+        clients = [self._client(), self._client(token='other'),
+                   self._client(endpoint='http://other')]
+        for i, client in enumerate(clients):
+            client.images.find.return_value = self.image(str(i))
+        for i, client in enumerate(clients):
+            image = glance._upload_file(client, 'bm-kernel', None, 'aki',
+                                        'Kernel')
+            self.assertEqual(str(i), image.id)
+
+    def test_images_not_cached_unknown_endpoint(self):
+        client = self._client(endpoint=None)
+        client.images.find.return_value = self.image('aaa')
+        for _ in range(2):
+            glance._upload_file(client, 'bm-kernel', None, 'aki', 'Kernel')
+        self.assertEqual(2, client.images.find.call_count)
+
+    @mock.patch('time.time')
+    def test_images_cache_expired(self, time_mock):
+        client = self._client()
+        client.images.find.side_effect = (self.image('aaa'), self.image('bbb'))
+        time_mock.return_value = 1000
+        glance._upload_file(client, 'bm-kernel', None, 'aki', 'Kernel')
+        time_mock.return_value = 1000 + glance.IMAGE_CACHE_TTL + 1
+        image = glance._upload_file(client, 'bm-kernel', None, 'aki',
+                                    'Kernel')
+        self.assertEqual('bbb', image.id)
+        self.assertEqual(2, client.images.find.call_count)
+
+    def test_missing_image_not_cached(self):
+        client = mock.MagicMock()
+        client.images.find.side_effect = (exceptions.NotFound,
+                                          self.image('aaa'))
+        image = glance._upload_file(client, 'bm-kernel', None, 'aki',
+                                    'Kernel', skip_missing=True)
+        self.assertIsNone(image.id)
+        image = glance._upload_file(client, 'bm-kernel', None, 'aki',
+                                    'Kernel', skip_missing=True)
+        self.assertEqual('aaa', image.id)
+
+    def test_created_image_cached(self):
+        client = self._client()
+        client.images.find.side_effect = exceptions.NotFound
+        client.images.create.return_value = self.image('aaa')
+        with tempfile.NamedTemporaryFile() as imagefile:
+            glance._upload_file(client, 'bm-kernel', imagefile.name, 'aki',
+                                'Kernel')
+        image = glance._upload_file(client, 'bm-kernel', None, 'aki',
+                                    'Kernel')
+        self.assertEqual('aaa', image.id)
+        self.assertEqual(1, client.images.find.call_count)
+
+
+class GlanceV2Test(base.TestCase):
+
+    def setUp(self):
+        super(GlanceV2Test, self).setUp()
+        self.client = mock.MagicMock(spec=real_glance_client)
+        self.client.images = mock.MagicMock()
+
+    def _image(self, image_id, name='bm-kernel', disk_format='aki',
+               status='active'):
+        return {'id': image_id, 'name': name, 'disk_format': disk_format,
+                'status': status}
+
+    def test_find_image(self):
+        self.client.images.list.return_value = iter([
+            self._image('newest'), self._image('older')])
+        image = glance._find_image(self.client, 'bm-kernel', 'aki')
+        self.assertEqual('newest', image['id'])
+        self.client.images.list.assert_called_once_with(
+            filters={'name': 'bm-kernel', 'disk_format': 'aki',
+                     'status': 'active'},
+            sort_key=['created_at', 'id'], sort_dir=['desc', 'desc'],
+            page_size=glance.IMAGE_LOOKUP_PAGE_SIZE)
+
+    def test_find_image_stops_at_first_match(self):
+        def images():
+            yield self._image('wrong', name='bm-kernel-old')
+            yield self._image('queued', status='queued')
+            yield self._image('match')
+            raise AssertionError('fetched too many images')
+
+        self.client.images.list.return_value = images()
+        image = glance._find_image(self.client, 'bm-kernel', 'aki')
+        self.assertEqual('match', image['id'])
+
+    def test_find_image_not_found(self):
+        self.client.images.list.return_value = iter([
+            self._image('wrong', disk_format='ari')])
+        self.assertRaises(exceptions.NotFound, glance._find_image,
+                          self.client, 'bm-kernel', 'aki')
+
+    def _write_image(self, content):
+        imagefile = tempfile.NamedTemporaryFile()
+        imagefile.write(content)
+        imagefile.flush()
+        self.addCleanup(imagefile.close)
+        return imagefile.name
+
+    def test_upload_image(self):
+        path = self._write_image(b'x' * (glance.IMAGE_UPLOAD_CHUNK_SIZE + 1))
+        self.client.images.list.side_effect = (iter([]), iter([]))
+        self.client.images.create.return_value = mock.Mock(id='aaa')
+        uploaded = []
+        self.client.images.upload.side_effect = (
+            lambda image_id, data: uploaded.extend(data))
+
+        image = glance._upload_file(self.client, 'bm-kernel', path, 'aki',
+                                    'Kernel')
+
+        self.assertEqual('aaa', image.id)
+        self.client.images.create.assert_called_once_with(
+            name='bm-kernel', disk_format='aki', container_format='aki',
+            visibility='public')
+        self.assertEqual([glance.IMAGE_UPLOAD_CHUNK_SIZE, 1],
+                         [len(chunk) for chunk in uploaded])
+        self.client.images.list.assert_called_with(
+            filters={'checksum': hashlib.md5(b'x' * len(b''.join(uploaded)))
+                     .hexdigest(),
+                     'disk_format': 'aki', 'status': 'active'},
+            page_size=glance.IMAGE_LOOKUP_PAGE_SIZE)
+
+    def test_upload_image_skipped_same_checksum(self):
+        path = self._write_image(b'kernel')
+        checksum = hashlib.md5(b'kernel').hexdigest()
+        # Like glanceclient v2 images, allow both item and attribute access
+        existing = mock.MagicMock(spec=dict, id='existing')
+        existing.get.side_effect = {'checksum': checksum,
+                                    'disk_format': 'aki'}.get
+        self.client.images.list.side_effect = (iter([]), iter([existing]))
+
+        image = glance._upload_file(self.client, 'bm-kernel', path, 'aki',
+                                    'Kernel')
+
+        self.assertEqual('existing', image.id)
+        self.client.images.create.assert_not_called()
+        self.client.images.upload.assert_not_called()
+
+    def test_checksummed_file(self):
+        path = self._write_image(b'abcde')
+        reader = glance._ChecksummedFile(path, chunk_size=2)
+        self.assertEqual([b'ab', b'cd', b'e'], list(reader))
+        self.assertEqual(5, reader.size)
+        self.assertEqual(hashlib.md5(b'abcde').hexdigest(), reader.checksum)
+
+    def test_checksummed_file_read(self):
+        path = self._write_image(b'abcde')
+        reader = glance._ChecksummedFile(path)
+        self.assertEqual(b'abc', reader.read(3))
+        self.assertEqual(b'de', reader.read(3))
+        self.assertEqual(b'', reader.read(3))
+        self.assertEqual(b'', reader.read())
+        self.assertEqual(5, reader.size)
+        self.assertEqual(hashlib.md5(b'abcde').hexdigest(), reader.checksum)
+
+    def test_checksummed_file_glanceclient_body(self):
+        content = b'x' * (glance_http.CHUNKSIZE * 2 + 1)
+        path = self._write_image(content)
+        reader = glance._ChecksummedFile(path)
+        headers = {}
+        kwargs = {'data': reader}
+
+        # This is how glanceclient turns the data of an upload into the
+        # body of the HTTP request
+        client = glance_http.HTTPClient('http://glance')
+        body = client._set_common_request_kwargs(headers, kwargs)
+
+        self.assertEqual(content, b''.join(body))
+        self.assertEqual('application/octet-stream', headers['Content-Type'])
+        self.assertEqual(len(content), reader.size)
+        self.assertEqual(hashlib.md5(content).hexdigest(), reader.checksum)
+
+    def test_upload_image_failed(self):
+        path = self._write_image(b'kernel')
+        self.client.images.list.side_effect = (iter([]), iter([]))
+        self.client.images.create.return_value = mock.Mock(id='aaa')
+        self.client.images.upload.side_effect = (
+            exceptions.HTTPInternalServerError)
+
+        self.assertRaises(exceptions.HTTPInternalServerError,
+                          glance._upload_file, self.client, 'bm-kernel',
+                          path, 'aki', 'Kernel')
+        self.client.images.delete.assert_called_once_with('aaa')
@@ -0,0 +1,130 @@
+# Copyright 2016 Red Hat, Inc.
+# All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+import os
+import shutil
+import tempfile
+
+import mock
+
+from tripleo_common.tests import base
+from tripleo_common.utils import introspection
+
+FINISHED_AT = '2016-10-18T10:00:00'
+
+
+class IntrospectionDataCacheTest(base.TestCase):
+
+    def setUp(self):
+        super(IntrospectionDataCacheTest, self).setUp()
+        self.path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.path)
+        self.cache = introspection.IntrospectionDataCache(self.path)
+        self.data = {'inventory': {'disks': [{'name': '/dev/sda'}]}}
+
+    def _data_files(self):
+        return os.listdir(os.path.join(self.path, 'data'))
+
+    def test_put_get(self):
+        self.cache.put('uuid1', FINISHED_AT, self.data)
+        self.assertEqual(self.data, self.cache.get('uuid1', FINISHED_AT))
+
+    def test_get_missing(self):
+        self.assertIsNone(self.cache.get('uuid1', FINISHED_AT))
+
+    def test_get_other_inspection(self):
+        self.cache.put('uuid1', FINISHED_AT, self.data)
+        self.assertIsNone(self.cache.get('uuid1', '2016-10-18T11:00:00'))
+
+    def test_same_content_stored_once(self):
+        self.cache.put('uuid1', FINISHED_AT, self.data)
+        self.cache.put('uuid2', FINISHED_AT, self.data)
+        self.assertEqual(1, len(self._data_files()))
+        self.assertEqual(self.data, self.cache.get('uuid2', FINISHED_AT))
+
+    def test_corrupted_data(self):
+        self.cache.put('uuid1', FINISHED_AT, self.data)
+        name = self._data_files()[0]
+        with open(os.path.join(self.path, 'data', name), 'w') as f:
+            f.write('{}')
+        self.assertIsNone(self.cache.get('uuid1', FINISHED_AT))
+
+    def test_directory_not_private(self):
+        os.chmod(self.path, 0o755)
+        self.cache.put('uuid1', FINISHED_AT, self.data)
+        self.assertEqual([], os.listdir(self.path))
+        self.assertIsNone(self.cache.get('uuid1', FINISHED_AT))
+
+    @mock.patch('os.geteuid', return_value=12345)
+    def test_directory_of_other_user(self, geteuid_mock):
+        cache = introspection.IntrospectionDataCache(self.path)
+        cache.put('uuid1', FINISHED_AT, self.data)
+        self.assertEqual([], os.listdir(self.path))
+
+    def test_evict_least_recently_used(self):
+        self.cache.put('uuid1', FINISHED_AT, {'node': 1})
+        self.cache.put('uuid2', FINISHED_AT, {'node': 2})
+        size = sum(os.path.getsize(os.path.join(self.path, 'data', name))
+                   for name in self._data_files())
+        self.cache.max_size = size
+        data_dir = os.path.join(self.path, 'data')
+        for name in self._data_files():
+            os.utime(os.path.join(data_dir, name), (1000, 1000))
+        # Reading marks uuid1 as recently used
+        self.assertEqual({'node': 1}, self.cache.get('uuid1', FINISHED_AT))
+
+        self.cache.put('uuid3', FINISHED_AT, {'node': 3})
+
+        self.assertEqual(2, len(self._data_files()))
+        self.assertEqual({'node': 1}, self.cache.get('uuid1', FINISHED_AT))
+        self.assertIsNone(self.cache.get('uuid2', FINISHED_AT))
+        self.assertEqual({'node': 3}, self.cache.get('uuid3', FINISHED_AT))
+
+
+class GetDataTest(base.TestCase):
+
+    def setUp(self):
+        super(GetDataTest, self).setUp()
+        self.inspector = mock.Mock()
+        self.inspector.get_status.return_value = {'finished_at': FINISHED_AT}
+        self.inspector.get_data.return_value = {'inventory': {}}
+        self.cache = mock.Mock(spec=introspection.IntrospectionDataCache)
+
+    def test_cache_miss(self):
+        self.cache.get.return_value = None
+        data = introspection.get_data(self.inspector, 'uuid1', self.cache)
+        self.assertEqual({'inventory': {}}, data)
+        self.cache.get.assert_called_once_with('uuid1', FINISHED_AT)
+        self.cache.put.assert_called_once_with('uuid1', FINISHED_AT,
+                                               {'inventory': {}})
+
+    def test_cache_hit(self):
+        self.cache.get.return_value = {'cached': True}
+        data = introspection.get_data(self.inspector, 'uuid1', self.cache)
+        self.assertEqual({'cached': True}, data)
+        self.inspector.get_data.assert_not_called()
+        self.cache.put.assert_not_called()
+
+    def test_not_finished(self):
+        self.inspector.get_status.return_value = {'finished_at': None}
+        data = introspection.get_data(self.inspector, 'uuid1', self.cache)
+        self.assertEqual({'inventory': {}}, data)
+        self.cache.get.assert_not_called()
+        self.cache.put.assert_not_called()
+
+    def test_cache_write_error(self):
+        self.cache.get.return_value = None
+        self.cache.put.side_effect = OSError('disk full')
+        data = introspection.get_data(self.inspector, 'uuid1', self.cache)
+        self.assertEqual({'inventory': {}}, data)
@@ -14,10 +14,14 @@
 # limitations under the License.
 
 import collections
+import re
 
+from ironicclient import exc as ironicexp
 import mock
+import six
 from testtools import matchers
 
+from tripleo_common import constants
 from tripleo_common import exception
 from tripleo_common.tests import base
 from tripleo_common.utils import nodes
@@ -177,11 +181,136 @@ class FindNodeHandlerTest(base.TestCase):
         self.assertRaises(exception.InvalidNode,
                           nodes._find_node_handler, {})
 
+    def test_found_memoized(self):
+        with mock.patch.object(nodes, '_DRIVER_HANDLERS', {}) as handlers:
+            handler = nodes._find_driver_handler('pxe_ipmitool')
+            self.assertEqual({'pxe_ipmitool': handler}, handlers)
+            with mock.patch.object(nodes, '_DRIVER_PATTERNS', []):
+                self.assertIs(handler,
+                              nodes._find_driver_handler('pxe_ipmitool'))
+
+    def test_found_longest_match(self):
+        short = mock.Mock()
+        longest = mock.Mock()
+        patterns = [(re.compile('a.*_ssh'), short),
+                    (re.compile('b.*_ssh_foo'), mock.Mock()),
+                    (re.compile('.*_ssh_foo'), longest)]
+        with mock.patch.object(nodes, '_DRIVER_PATTERNS', patterns), \
+                mock.patch.object(nodes, '_DRIVER_HANDLERS', {}):
+            self.assertIs(longest, nodes._find_driver_handler('agent_ssh_foo'))
+            self.assertIs(short, nodes._find_driver_handler('agent_ssh'))
+
     def test_unknown_driver(self):
         self.assertRaises(exception.InvalidNode,
                           nodes._find_node_handler, {'pm_type': 'foobar'})
 
 
+class IterNodesJsonTest(base.TestCase):
+    def _chunks(self, data, size):
+        return [data[i:i + size] for i in range(0, len(data), size)]
+
+    def test_instackenv(self):
+        data = ('{"arch": "x86_64", "power_manager": {"a": [1, 2]},\n'
+                ' "nodes": [{"name": "n\u00e9ud1", "mac": ["aa"]},\n'
+                '           {"name": "node2", "cpu": 12}],'
+                ' "host-ip": "1.2.3.4"}').encode('utf-8')
+        for size in (1, 3, 7, 1024):
+            result = list(nodes.iter_nodes_json(self._chunks(data, size)))
+            self.assertEqual([{'name': u'n\u00e9ud1', 'mac': ['aa']},
+                              {'name': 'node2', 'cpu': 12}], result)
+
+    def test_list(self):
+        data = '[{"name": "node1"}, {"name": "node2"}]'
+        self.assertEqual([{'name': 'node1'}, {'name': 'node2'}],
+                         list(nodes.iter_nodes_json(self._chunks(data, 4))))
+
+    def test_empty(self):
+        self.assertEqual([], list(nodes.iter_nodes_json(['{"nodes": [ ]}'])))
+
+    def test_no_nodes(self):
+        self.assertRaises(ValueError, list,
+                          nodes.iter_nodes_json(['{"arch": "x86_64"}']))
+
+    def test_invalid(self):
+        self.assertRaises(ValueError, list,
+                          nodes.iter_nodes_json(['[{"name": }]']))
+
+    def test_missing_comma_between_fields(self):
+        data = '{"arch": 1 "nodes": [{"name": "node1"}]}'
+        self.assertRaisesRegexp(ValueError, "Expected ','", list,
+                                nodes.iter_nodes_json([data]))
+
+    def test_truncated(self):
+        self.assertRaisesRegexp(ValueError, 'Unexpected end of input', list,
+                                nodes.iter_nodes_json(['[1, 2']))
+
+    def test_error_position_in_document(self):
+        data = '[{"name": "node1"}, {"name": "node2"} {"name": "node3"}]'
+        for size in (1, 5, 1024):
+            self.assertRaisesRegexp(
+                ValueError, "Expected ',' at character 38 ", list,
+                nodes.iter_nodes_json(self._chunks(data, size)))
+
+    def test_lazy(self):
+        def chunks():
+            yield '[{"name": "node1"},'
+            raise AssertionError('read too far')
+
+        self.assertEqual({'name': 'node1'},
+                         next(nodes.iter_nodes_json(chunks())))
+
+
+class ValidateNodesTest(base.TestCase):
+    def test_valid(self):
+        nodes_list = [{'pm_type': 'pxe_ipmitool', 'pm_addr': '1.2.3.4',
+                       'mac': ['aa']},
+                      {'pm_type': 'fake_pxe'}]
+        self.assertEqual([], nodes.validate_nodes(nodes_list))
+
+    def test_invalid(self):
+        nodes_list = [{'pm_type': 'pxe_ipmitool', 'pm_addr': '1.2.3.4'},
+                      {'name': 'node1'},
+                      {'pm_type': 'foobar'},
+                      {'pm_type': 'pxe_ipmitool', 'name': 'node3'},
+                      {'pm_type': 'fake_pxe', 'mac': 'aa'},
+                      'not a node']
+        errors = nodes.validate_nodes(iter(nodes_list))
+        self.assertEqual(5, len(errors))
+        self.assertTrue(errors[0].startswith('node 1 (node1): '))
+        self.assertIn('pm_type', errors[0])
+        self.assertIn('unknown pm_type', errors[1])
+        self.assertIn("'pm_addr' is required", errors[2])
+        self.assertIn('mac must be a list', errors[3])
+        self.assertTrue(errors[4].startswith('node 5: '))
+
+    def test_duplicates(self):
+        nodes_list = [{'pm_type': 'pxe_ipmitool', 'pm_addr': '1.2.3.4',
+                       'mac': ['AA:BB'], 'name': 'node0'},
+                      {'pm_type': 'pxe_ipmitool', 'pm_addr': '1.2.3.5',
+                       'mac': ['aa-bb', 'cc:dd'], 'uuid': 'abcdef'},
+                      {'pm_type': 'pxe_ipmitool', 'pm_addr': '1.2.3.4',
+                       'mac': ['ee:ff'], 'name': 'node0', 'uuid': 'abcdef'},
+                      {'pm_type': 'pxe_ssh', 'pm_addr': '1.2.3.4',
+                       'mac': ['cc:dd']},
+                      {'pm_type': 'fake_pxe', 'mac': ['11:22', '11:22']}]
+        errors = nodes.validate_nodes(nodes_list)
+        self.assertEqual(
+            ['node 1: MAC address aa:bb is already used by node 0',
+             'node 2 (node0): BMC address 1.2.3.4 is already used by node 0',
+             'node 2 (node0): name node0 is already used by node 0',
+             'node 2 (node0): UUID abcdef is already used by node 1',
+             'node 3: MAC address cc:dd is already used by node 1'],
+            errors)
+
+    def test_register_all_nodes_invalid(self):
+        ironic = mock.MagicMock()
+        nodes_list = [{'pm_type': 'fake_pxe'}, {'pm_type': 'foobar'}]
+        self.assertRaises(exception.InvalidNode, nodes.register_all_nodes,
+                          'servicehost', nodes_list, client=ironic)
+        self.assertFalse(ironic.node.list.called)
+        self.assertFalse(ironic.node.create.called)
+
+
 class NodeProvisionStateTest(base.TestCase):
 
     def test_wait_for_provision_state(self):
@@ -207,6 +336,19 @@ class NodeProvisionStateTest(base.TestCase):
             nodes.wait_for_provision_state,
             baremetal_client, 'UUID', "available", loops=1, sleep=0.01)
 
+    def test_provision_state_waiter_explicit_zero(self):
+        waiter = nodes._provision_state_waiter(loops=3, sleep=0)
+        self.assertEqual(0, waiter.delay)
+        self.assertEqual(3, waiter.max_polls)
+        waiter = nodes._provision_state_waiter(loops=0)
+        self.assertEqual(0, waiter.max_polls)
+        self.assertEqual(1, waiter.delay)
+
+    def test_provision_state_waiter_default(self):
+        waiter = nodes._provision_state_waiter()
+        self.assertEqual(constants.PROVISION_STATE_TIMEOUT_DEFAULT,
+                         waiter.timeout)
+
     def test_wait_for_provision_state_fail(self):
         baremetal_client = mock.Mock()
         baremetal_client.node.get.return_value = mock.Mock(
@@ -217,6 +359,64 @@ class NodeProvisionStateTest(base.TestCase):
             nodes.wait_for_provision_state,
             baremetal_client, 'UUID', "available", loops=1, sleep=0.01)
 
+    def test_wait_for_nodes_provision_state(self):
+        baremetal_client = mock.Mock()
+        baremetal_client.node.list.side_effect = [
+            [mock.Mock(uuid='A', provision_state='manageable',
+                       last_error=None),
+             mock.Mock(uuid='B', provision_state='verifying',
+                       last_error=None),
+             mock.Mock(uuid='C', provision_state='enroll',
+                       last_error='node on fire'),
+             mock.Mock(uuid='D', provision_state='verifying',
+                       last_error=None),
+             mock.Mock(uuid='E', provision_state='active',
+                       last_error=None)],
+            [mock.Mock(uuid='B', provision_state='manageable',
+                       last_error=None),
+             mock.Mock(uuid='D', provision_state='verifying',
+                       last_error=None)],
+        ]
+        results = nodes.wait_for_nodes_provision_state(
+            baremetal_client, ['A', 'B', 'C', 'D'], 'manageable',
+            loops=2, sleep=0.01)
+
+        self.assertEqual(2, baremetal_client.node.list.call_count)
+        self.assertFalse(baremetal_client.node.get.called)
+        self.assertEqual({'A', 'B', 'C', 'D'}, set(results))
+        self.assertIsNone(results['A'])
+        self.assertIsNone(results['B'])
+        self.assertIsInstance(results['C'], exception.StateTransitionFailed)
+        self.assertIsInstance(results['D'], exception.Timeout)
+
+    @mock.patch('tripleo_common.utils.nodes.wait_for_nodes_provision_state')
+    @mock.patch('tripleo_common.utils.nodes.wait_for_provision_state')
+    def test_set_nodes_state_batch(self, wait_for_state_mock,
+                                   wait_for_states_mock):
+        bm_client = mock.Mock()
+        node_list = [
+            mock.Mock(uuid="ABCDEFGH", provision_state="active"),
+            mock.Mock(uuid="IJKLMNOP", provision_state="manageable"),
+            mock.Mock(uuid="QRSTUVWX", provision_state="manageable")
+        ]
+        wait_for_states_mock.return_value = {
+            'IJKLMNOP': None,
+            'QRSTUVWX': exception.Timeout('boom')}
+
+        affected_nodes = nodes.set_nodes_state(
+            bm_client, node_list, 'provide', 'available',
+            ('active', 'available'), batch=True)
+
+        bm_client.node.set_provision_state.assert_has_calls([
+            mock.call('IJKLMNOP', 'provide'),
+            mock.call('QRSTUVWX', 'provide'),
+        ])
+        wait_for_states_mock.assert_called_once_with(
+            bm_client, ['IJKLMNOP', 'QRSTUVWX'], 'available', waiter=None)
+        self.assertFalse(wait_for_state_mock.called)
+        self.assertEqual(['IJKLMNOP', 'QRSTUVWX'],
+                         [node.uuid for node in affected_nodes])
+
     @mock.patch('tripleo_common.utils.nodes.wait_for_provision_state')
     def test_set_nodes_state(self, wait_for_state_mock):
 
@@ -241,6 +441,47 @@ class NodeProvisionStateTest(base.TestCase):
 
         self.assertEqual(uuids, ['IJKLMNOP', ])
 
+    @mock.patch('tripleo_common.utils.nodes.wait_for_provision_state')
+    def test_set_nodes_state_return_results(self, wait_for_state_mock):
+        error = exception.Timeout('boom')
+        wait_for_state_mock.side_effect = [None, error]
+        bm_client = mock.Mock()
+        node_list = [
+            mock.Mock(uuid="ABCDEFGH", provision_state="active"),
+            mock.Mock(uuid="IJKLMNOP", provision_state="manageable"),
+            mock.Mock(uuid="QRSTUVWX", provision_state="manageable")
+        ]
+
+        affected_nodes, results = nodes.set_nodes_state(
+            bm_client, node_list, 'provide', 'available',
+            ('active', 'available'), return_results=True)
+
+        self.assertEqual(['IJKLMNOP', 'QRSTUVWX'],
+                         [node.uuid for node in affected_nodes])
+        self.assertEqual({'IJKLMNOP': None, 'QRSTUVWX': error}, results)
+
+    @mock.patch('tripleo_common.utils.nodes.wait_for_nodes_provision_state')
+    def test_set_nodes_state_batch_return_results(self, wait_for_states_mock):
+        wait_for_states_mock.return_value = {
+            'IJKLMNOP': None,
+            'QRSTUVWX': exception.Timeout('boom')}
+        node_list = [
+            mock.Mock(uuid="IJKLMNOP", provision_state="manageable"),
+            mock.Mock(uuid="QRSTUVWX", provision_state="manageable")
+        ]
+
+        affected_nodes, results = nodes.set_nodes_state(
+            mock.Mock(), node_list, 'provide', 'available', batch=True,
+            return_results=True)
+
+        self.assertEqual(wait_for_states_mock.return_value, results)
+
+    def test_set_nodes_state_return_results_nothing_altered(self):
+        node_list = [mock.Mock(uuid="ABCDEFGH", provision_state="active")]
+        self.assertEqual(([], {}), nodes.set_nodes_state(
+            mock.Mock(), node_list, 'provide', 'available', ('active',),
+            batch=True, return_results=True))
+
 
 class NodesTest(base.TestCase):
 
@@ -307,6 +548,34 @@ class NodesTest(base.TestCase):
         ironic.port.create.assert_has_calls([port_call])
         ironic.node.set_power_state.assert_has_calls([power_off_call])
 
+    @mock.patch('tripleo_common.utils.nodes.set_nodes_state')
+    @mock.patch('tripleo_common.utils.nodes._update_or_register_ironic_node')
+    def test_register_all_nodes_provide_manageable_only(self, register_mock,
+                                                        set_state_mock):
+        node_a = mock.Mock(uuid='A', provision_state='enroll')
+        node_b = mock.Mock(uuid='B', provision_state='enroll')
+        register_mock.side_effect = [node_a, node_b]
+        set_state_mock.side_effect = [
+            ([node_a, node_b], {'A': None, 'B': exception.Timeout('boom')}),
+            [node_a],
+        ]
+        second = self._get_node()
+        second['name'] = 'node2'
+        second['mac'] = ['bbb']
+        ironic = mock.MagicMock()
+        ironic.node.list.return_value = []
+
+        nodes.register_all_nodes('servicehost', [self._get_node(), second],
+                                 client=ironic)
+
+        set_state_mock.assert_has_calls([
+            mock.call(ironic, [node_a, node_b], 'manage', 'manageable',
+                      skipped_states={'manageable', 'available'},
+                      batch=False, return_results=True),
+            mock.call(ironic, [node_a], 'provide', 'available',
+                      skipped_states={'available'}, batch=False),
+        ])
+
     def test_register_all_nodes_kernel_ramdisk(self):
         node_list = [self._get_node()]
         node_properties = {"cpus": "1",
@@ -392,6 +661,41 @@ class NodesTest(base.TestCase):
         ironic.port.create.assert_has_calls([port_call])
         ironic.node.set_power_state.assert_has_calls([power_off_call])
 
+    def test_register_all_nodes_concurrency(self):
+        node_list = [self._get_node() for _ in range(5)]
+        for i, node in enumerate(node_list):
+            node['name'] = 'node%d' % i
+            node['mac'] = ['aa:%d' % i]
+        ironic = mock.MagicMock()
+        ironic.node.create.side_effect = lambda **kw: mock.Mock(
+            uuid=kw['name'])
+        seen = nodes.register_all_nodes('servicehost', node_list,
+                                        client=ironic, provide=False,
+                                        concurrency=3)
+        self.assertEqual(['node0', 'node1', 'node2', 'node3', 'node4'],
+                         [n.uuid for n in seen])
+        self.assertEqual(5, ironic.node.create.call_count)
+        self.assertEqual(5, ironic.port.create.call_count)
+
+    def test_register_all_nodes_conflict_before_writes(self):
+        node_list = [self._get_node(), self._get_node()]
+        node_list[1]['pm_type'] = 'pxe_ipmitool'
+        ironic = mock.MagicMock()
+        ironic_port = collections.namedtuple('port', ['address',
+                                             'node_uuid'])
+        ironic_node = collections.namedtuple('node', ['uuid', 'driver',
+                                             'driver_info'])
+        ironic.port.list.return_value = [ironic_port('aaa', 'abcdef')]
+        ironic.node.list.return_value = [
+            ironic_node('abcdef', 'pxe_ssh', {}),
+            ironic_node('fedcba', 'pxe_ipmitool',
+                        {'ipmi_address': 'foo.bar'})]
+        self.assertRaises(exception.InvalidNode,
+                          nodes.register_all_nodes, 'servicehost',
+                          node_list, client=ironic, concurrency=2)
+        self.assertFalse(ironic.node.create.called)
+        self.assertFalse(ironic.node.update.called)
+
     def test_register_update(self):
         node = self._get_node()
         ironic = mock.MagicMock()
@@ -537,6 +841,52 @@ class NodesTest(base.TestCase):
                                               client=ironic)
         ironic.node.update.assert_called_once_with('abcdef', mock.ANY)
 
+    def _get_ironic_node(self):
+        return mock.Mock(
+            uuid='abcdef',
+            properties={'cpus': '1', 'memory_mb': 2048, 'local_gb': '30',
+                        'cpu_arch': 'amd64',
+                        'capabilities': 'num_nics:6'},
+            driver_info={'ssh_address': 'foo.bar',
+                         'ssh_username': 'test',
+                         'ssh_key_contents': 'random',
+                         'ssh_virt_type': 'virsh'})
+
+    def test_register_update_unchanged(self):
+        node = self._get_node()
+        ironic = mock.MagicMock()
+        ironic_node = self._get_ironic_node()
+        ironic_node.name = 'node1'
+        node_map = {'mac': {'aaa': 'abcdef'},
+                    'nodes': {'abcdef': ironic_node}}
+        result = nodes._update_or_register_ironic_node(None, node, node_map,
+                                                       client=ironic)
+        self.assertFalse(ironic.node.update.called)
+        self.assertIs(ironic_node, result)
+
+    def test_register_update_only_changed(self):
+        node = self._get_node()
+        node['capabilities'] = 'profile:compute,num_nics:6'
+        ironic = mock.MagicMock()
+        ironic_node = self._get_ironic_node()
+        ironic_node.name = 'node1'
+        ironic_node.properties['capabilities'] = 'num_nics:6,profile:compute'
+        ironic_node.properties['memory_mb'] = '1024'
+        ironic_node.driver_info['ssh_key_contents'] = '******'
+        node_map = {'mac': {'aaa': 'abcdef'},
+                    'nodes': {'abcdef': ironic_node}}
+        nodes._update_or_register_ironic_node(None, node, node_map,
+                                              client=ironic)
+        update_patch = [
+            {'path': '/properties/memory_mb', 'value': '2048', 'op': 'add'},
+            {'path': '/driver_info/ssh_key_contents', 'value': 'random',
+             'op': 'add'}]
+        ironic.node.update.assert_called_once_with('abcdef', mock.ANY)
+        self.assertThat(update_patch,
+                        matchers.MatchesSetwise(
+                            *(map(matchers.Equals,
+                                  ironic.node.update.call_args[0][1]))))
+
     def test_register_ironic_node_int_values(self):
         node_properties = {"cpus": "1",
                            "memory_mb": "2048",
@@ -610,6 +960,43 @@ class NodesTest(base.TestCase):
         nodes._clean_up_extra_nodes(seen, client, remove=True)
         client.node.delete.assert_called_once_with('foobar')
 
+    def test_clean_up_extra_nodes_node_map(self):
+        node = collections.namedtuple('node', ['uuid'])
+        client = mock.MagicMock()
+        client.node.delete.side_effect = [None, RuntimeError('boom')]
+        seen = [node('abcd')]
+        node_map = {'uuids': {'abcd', 'efgh', 'ijkl'}}
+        results = nodes._clean_up_extra_nodes(seen, client, remove=True,
+                                              node_map=node_map,
+                                              concurrency=1)
+        self.assertFalse(client.node.list.called)
+        client.node.delete.assert_has_calls([mock.call('efgh'),
+                                             mock.call('ijkl')])
+        self.assertEqual(['efgh', 'ijkl'], sorted(results))
+        self.assertIsNone(results['efgh'])
+        self.assertIsInstance(results['ijkl'], RuntimeError)
+
+    def test_clean_up_extra_nodes_concurrency(self):
+        node = collections.namedtuple('node', ['uuid'])
+        client = mock.MagicMock()
+        node_map = {'uuids': {'n%d' % i for i in range(10)}}
+        results = nodes._clean_up_extra_nodes([node('n0')], client,
+                                              remove=True,
+                                              node_map=node_map,
+                                              concurrency=4)
+        self.assertEqual(9, client.node.delete.call_count)
+        self.assertEqual(dict.fromkeys('n%d' % i for i in range(1, 10)),
+                         results)
+
+    def test_clean_up_extra_nodes_no_remove(self):
+        node = collections.namedtuple('node', ['uuid'])
+        client = mock.MagicMock()
+        node_map = {'uuids': {'abcd', 'efgh'}}
+        results = nodes._clean_up_extra_nodes([node('abcd')], client,
+                                              node_map=node_map)
+        self.assertFalse(client.node.delete.called)
+        self.assertEqual({'efgh': None}, results)
+
     def test__get_node_id_fake_pxe(self):
         node = self._get_node()
         node['pm_type'] = 'fake_pxe'
@@ -639,26 +1026,155 @@ class TestPopulateNodeMapping(base.TestCase):
         client = mock.MagicMock()
         ironic_node = collections.namedtuple('node', ['uuid', 'driver',
                                              'driver_info'])
-        ironic_port = collections.namedtuple('port', ['address'])
+        ironic_port = collections.namedtuple('port', ['address',
+                                             'node_uuid'])
         node1 = ironic_node('abcdef', 'pxe_ssh', None)
         node2 = ironic_node('fedcba', 'pxe_ipmitool',
                             {'ipmi_address': '10.0.1.2'})
-        client.node.list_ports.side_effect = ([ironic_port('aaa')],
-                                              [])
+        client.port.list.return_value = [ironic_port('aaa', 'abcdef')]
         client.node.list.return_value = [node1, node2]
         expected = {'mac': {'aaa': 'abcdef'},
                     'pm_addr': {'10.0.1.2': 'fedcba'},
-                    'uuids': {'abcdef', 'fedcba'}}
+                    'uuids': {'abcdef', 'fedcba'},
+                    'nodes': {'abcdef': node1, 'fedcba': node2}}
         self.assertEqual(expected, nodes._populate_node_mapping(client))
+        client.node.list.assert_called_once_with(detail=True, limit=0)
+        client.port.list.assert_called_once_with(
+            fields=['address', 'node_uuid'], limit=0)
+        self.assertFalse(client.node.list_ports.called)
+
+    def test_populate_node_mapping_ironic_mac_case(self):
+        client = mock.MagicMock()
+        ironic_node = collections.namedtuple('node', ['uuid', 'driver',
+                                             'driver_info'])
+        ironic_port = collections.namedtuple('port', ['address',
+                                             'node_uuid'])
+        client.port.list.return_value = [
+            ironic_port('AA:BB', 'abcdef'), ironic_port('cc:dd', 'abcdef')]
+        client.node.list.return_value = [
+            ironic_node('abcdef', 'fake_pxe', None)]
+        node_map = nodes._populate_node_mapping(client)
+        self.assertEqual({'aa:bb': 'abcdef', 'cc:dd': 'abcdef'},
+                         node_map['mac'])
 
     def test_populate_node_mapping_ironic_fake_pxe(self):
         client = mock.MagicMock()
         ironic_node = collections.namedtuple('node', ['uuid', 'driver',
                                              'driver_info'])
-        ironic_port = collections.namedtuple('port', ['address'])
+        ironic_port = collections.namedtuple('port', ['address',
+                                             'node_uuid'])
         node = ironic_node('abcdef', 'fake_pxe', None)
-        client.node.list_ports.return_value = [ironic_port('aaa')]
+        client.port.list.return_value = [ironic_port('aaa', 'abcdef')]
         client.node.list.return_value = [node]
         expected = {'mac': {'aaa': 'abcdef'}, 'pm_addr': {},
-                    'uuids': {'abcdef'}}
+                    'uuids': {'abcdef'}, 'nodes': {'abcdef': node}}
         self.assertEqual(expected, nodes._populate_node_mapping(client))
+
+
+class CapabilitiesTest(base.TestCase):
+
+    def setUp(self):
+        super(CapabilitiesTest, self).setUp()
+        nodes._capabilities_cache.clear()
+        self.addCleanup(nodes._capabilities_cache.clear)
+
+    def test_parse(self):
+        caps = nodes.Capabilities.parse('profile:compute,boot_option:local')
+        self.assertEqual({'profile': 'compute', 'boot_option': 'local'},
+                         caps)
+        self.assertEqual(['profile', 'boot_option'], list(caps))
+
+    def test_parse_value_with_colon(self):
+        self.assertEqual({'node': 'compute:0'},
+                         nodes.Capabilities.parse('node:compute:0'))
+
+    def test_parse_malformed(self):
+        caps = nodes.Capabilities.parse('profile:compute,,garbage,:x,a:')
+        self.assertEqual({'profile': 'compute', 'a': ''}, caps)
+
+    def test_parse_memoized(self):
+        caps1 = nodes.Capabilities.parse('profile:compute')
+        caps1['boot_option'] = 'local'
+        caps2 = nodes.Capabilities.parse('profile:compute')
+        # The memoized result is not shared with the callers
+        self.assertEqual({'profile': 'compute'}, caps2)
+        self.assertEqual(1, len(nodes._capabilities_cache))
+
+    def test_cache_bounded(self):
+        for i in range(nodes.CAPABILITIES_CACHE_SIZE + 1):
+            nodes.Capabilities.parse('num:%d' % i)
+        self.assertLessEqual(len(nodes._capabilities_cache),
+                             nodes.CAPABILITIES_CACHE_SIZE)
+
+    def test_str_keeps_order(self):
+        caps = nodes.capabilities_to_dict('num_nics:6,profile:control')
+        caps['profile'] = 'compute'
+        caps['boot_option'] = 'local'
+        self.assertEqual('num_nics:6,profile:compute,boot_option:local',
+                         str(caps))
+        self.assertEqual(str(caps), nodes.dict_to_capabilities(caps))
+
+    def test_capabilities_to_dict(self):
+        self.assertEqual({}, nodes.capabilities_to_dict(None))
+        self.assertEqual({}, nodes.capabilities_to_dict(''))
+        caps = {'profile': 'compute'}
+        self.assertIs(caps, nodes.capabilities_to_dict(caps))
+
+
+class UpdateNodesCapabilitiesTest(base.TestCase):
+
+    def setUp(self):
+        super(UpdateNodesCapabilitiesTest, self).setUp()
+        self.client = mock.MagicMock()
+        self.client.node.list.return_value = [
+            mock.Mock(uuid='uuid1',
+                      properties={'capabilities': 'boot_option:local'}),
+            mock.Mock(uuid='uuid2', properties={}),
+            mock.Mock(uuid='other', properties={}),
+        ]
+
+    def test_run_on_nodes(self):
+        def func(node):
+            if node.uuid == 'uuid2':
+                raise RuntimeError('boom')
+            return node.properties
+
+        results, errors = nodes.run_on_nodes(
+            self.client, ['uuid1', 'uuid2', 'missing'], func, 'test',
+            concurrency=2)
+
+        self.assertEqual({'uuid1': self.client.node.list.return_value[0]
+                          .properties}, results)
+        self.assertEqual({'uuid2': 'boom',
+                          'missing': 'Node missing not found in Ironic'},
+                         errors)
+        self.client.node.list.assert_called_once_with(
+            fields=['uuid', 'properties'], limit=0)
+
+    def test_update(self):
+        results = nodes.update_nodes_capabilities(
+            ['uuid1', 'uuid2'], {'profile': 'compute'}, self.client,
+            concurrency=2)
+
+        self.assertEqual({'uuid1': None, 'uuid2': None}, results)
+        self.client.node.list.assert_called_once_with(
+            fields=['uuid', 'properties'], limit=0)
+        self.client.node.get.assert_not_called()
+        self.assertEqual(2, self.client.node.update.call_count)
+        self.client.node.update.assert_any_call(
+            'uuid1', [{'op': 'replace', 'path': '/properties/capabilities',
+                       'value': 'boot_option:local,profile:compute'}])
+        self.client.node.update.assert_any_call(
+            'uuid2', [{'op': 'replace', 'path': '/properties/capabilities',
+                       'value': 'profile:compute'}])
+
+    def test_update_errors(self):
+        error = ironicexp.Conflict()
+        self.client.node.update.side_effect = [error]
+        results = nodes.update_nodes_capabilities(
+            ['uuid1', 'missing'], {'profile': 'compute'}, self.client)
+
+        self.assertEqual({'uuid1': six.text_type(error),
+                          'missing': 'Node missing not found in Ironic'},
+                         results)
+        self.assertEqual(1, self.client.node.update.call_count)
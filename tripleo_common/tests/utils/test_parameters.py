@@ -0,0 +1,165 @@
+# Copyright 2016 Red Hat, Inc.
+# All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+import mock
+
+from tripleo_common.tests import base
+from tripleo_common.utils import parameters
+
+
+class ParametersTest(base.TestCase):
+
+    def setUp(self):
+        super(ParametersTest, self).setUp()
+        self.baremetal_client = mock.MagicMock()
+        self.baremetal_client.node.list.return_value = [
+            mock.Mock(properties={'capabilities': 'profile:compute'}),
+            mock.Mock(properties={
+                'capabilities': 'boot_option:local,profile:compute'}),
+            mock.Mock(properties={'capabilities': 'profile:control'}),
+            mock.Mock(properties={'capabilities': 'boot_option:local'}),
+            mock.Mock(properties={}),
+            mock.Mock(properties=None),
+        ]
+
+    def test_get_node_counts(self):
+        counts = parameters.get_node_counts(self.baremetal_client)
+        self.assertEqual({'compute': 2, 'control': 1}, counts)
+        self.baremetal_client.node.list.assert_called_once_with(
+            fields=['uuid', 'properties'], limit=0)
+        self.baremetal_client.node.get.assert_not_called()
+
+    def test_get_node_count(self):
+        self.assertEqual(
+            2, parameters.get_node_count('compute', self.baremetal_client))
+        self.assertEqual(
+            0, parameters.get_node_count('cephStorage',
+                                         self.baremetal_client))
+        self.baremetal_client.node.get.assert_not_called()
+
+
+class FlavorIndexTest(base.TestCase):
+
+    def setUp(self):
+        super(FlavorIndexTest, self).setUp()
+        self.compute_client = self._compute_client()
+        self.compute_client.flavors.list.return_value = [
+            self._flavor('baremetal', {}),
+            self._flavor('compute', {'capabilities:profile': 'compute'}),
+            self._flavor('control', {'capabilities:profile': 'control'}),
+            self._flavor('compute-2', {'capabilities:profile': 'compute'}),
+        ]
+
+    def _compute_client(self, endpoint='http://nova/v2.1', project='admin'):
+        client = mock.MagicMock()
+        client.client = mock.Mock(spec=['management_url', 'projectid'],
+                                  management_url=endpoint, projectid=project)
+        return client
+
+    def _flavor(self, name, extra_specs):
+        flavor = mock.Mock(spec=['name', 'get_keys'])
+        flavor.name = name
+        flavor.get_keys.return_value = extra_specs
+        return flavor
+
+    def test_get_flavor_index(self):
+        index = parameters.get_flavor_index(self.compute_client)
+        self.assertEqual({'compute': 'compute', 'control': 'control'}, index)
+        self.compute_client.flavors.list.assert_called_once_with(detailed=True)
+        self.compute_client.flavors.get.assert_not_called()
+
+    def test_get_flavor_index_extra_specs_listed(self):
+        flavor = mock.Mock(extra_specs={'capabilities:profile': 'compute'})
+        flavor.name = 'compute'
+        self.compute_client.flavors.list.return_value = [flavor]
+        index = parameters.get_flavor_index(self.compute_client)
+        self.assertEqual({'compute': 'compute'}, index)
+        flavor.get_keys.assert_not_called()
+
+    def test_get_flavor_index_cached(self):
+        for _ in range(3):
+            parameters.get_flavor_index(self.compute_client)
+        self.assertEqual(1, self.compute_client.flavors.list.call_count)
+
+    def test_get_flavor_index_cached_per_endpoint_and_project(self):
+        other_project = self._compute_client(project='demo')
+        other_project.flavors.list.return_value = []
+        other_cloud = self._compute_client(endpoint='http://nova2/v2.1')
+        other_cloud.flavors.list.return_value = []
+
+        parameters.get_flavor_index(self.compute_client)
+        self.assertEqual({}, parameters.get_flavor_index(other_project))
+        self.assertEqual({}, parameters.get_flavor_index(other_cloud))
+        self.assertEqual({'compute': 'compute', 'control': 'control'},
+                         parameters.get_flavor_index(self.compute_client))
+        self.assertEqual(1, self.compute_client.flavors.list.call_count)
+
+    def test_get_flavor_index_not_cached_unknown_project(self):
+        client = self._compute_client(project=None)
+        client.flavors.list.return_value = []
+        for _ in range(2):
+            parameters.get_flavor_index(client)
+        self.assertEqual(2, client.flavors.list.call_count)
+
+    @mock.patch('time.time')
+    def test_get_flavor_index_expired(self, time_mock):
+        time_mock.return_value = 1000
+        parameters.get_flavor_index(self.compute_client)
+        time_mock.return_value = 1000 + parameters.FLAVOR_CACHE_TTL + 1
+        parameters.get_flavor_index(self.compute_client)
+        self.assertEqual(2, self.compute_client.flavors.list.call_count)
+
+    def test_get_flavor(self):
+        self.assertEqual('control',
+                         parameters.get_flavor('control', self.compute_client))
+        self.assertEqual('baremetal',
+                         parameters.get_flavor('cephStorage',
+                                               self.compute_client))
+
+    def test_get_count_and_flavor_params(self):
+        baremetal_client = mock.MagicMock()
+        baremetal_client.node.list.return_value = [
+            mock.Mock(properties={'capabilities': 'profile:compute'}),
+        ]
+        params = parameters.get_count_and_flavor_params(
+            baremetal_client, self.compute_client)
+        self.assertEqual({
+            'ControllerCount': 0,
+            'OvercloudControlFlavor': 'control',
+            'ComputeCount': 1,
+            'OvercloudComputeFlavor': 'compute',
+            'BlockStorageCount': 0,
+            'OvercloudBlockStorageFlavor': 'baremetal',
+            'ObjectStorageCount': 0,
+            'OvercloudSwiftStorageFlavor': 'baremetal',
+            'CephStorageCount': 0,
+            'OvercloudCephStorageFlavor': 'baremetal',
+        }, params)
+        self.assertEqual(1, baremetal_client.node.list.call_count)
+        self.assertEqual(1, self.compute_client.flavors.list.call_count)
+
+    def test_set_count_and_flavor_params(self):
+        baremetal_client = mock.MagicMock()
+        baremetal_client.node.list.return_value = []
+        params = parameters.set_count_and_flavor_params(
+            'control', baremetal_client, self.compute_client)
+        self.assertEqual({'ControllerCount': 0,
+                          'OvercloudControlFlavor': 'control'}, params)
+
+    def test_get_roles_from_role_data(self):
+        role_data = [{'name': 'Controller'}, {'name': 'Compute'},
+                     {'name': 'CustomRole'}]
+        self.assertEqual(['compute', 'control'],
+                         parameters.get_roles_from_role_data(role_data))
+        self.assertEqual([], parameters.get_roles_from_role_data(None))
@@ -0,0 +1,99 @@
+# Copyright 2016 Red Hat, Inc.
+# All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+from ironicclient.common import base as ironic_base
+from ironicclient import exc as ironicexp
+import mock
+
+from tripleo_common.tests import base
+from tripleo_common.utils import retries
+
+
+class RetryPolicyTest(base.TestCase):
+
+    def setUp(self):
+        super(RetryPolicyTest, self).setUp()
+        self.clock = self.use_fake_clock()
+        retries.reset_stats()
+        self.addCleanup(retries.reset_stats)
+
+    def test_success(self):
+        func = mock.Mock(return_value=42)
+        policy = retries.RetryPolicy()
+        self.assertEqual(42, policy.call(func, 'a', b='c'))
+        func.assert_called_once_with('a', b='c')
+        self.assertEqual([], self.clock.sleeps)
+        self.assertEqual({'calls': 1}, retries.get_stats())
+
+    def test_retry_with_backoff(self):
+        func = mock.Mock(side_effect=[ironicexp.Conflict(),
+                                      ironicexp.ServiceUnavailable(), 42])
+        policy = retries.RetryPolicy(delay=1, jitter=0)
+        self.assertEqual(42, policy.call(func))
+        self.assertEqual([1, 2], self.clock.sleeps)
+        self.assertEqual({'calls': 1, 'retried_calls': 1, 'retries': 2},
+                         retries.get_stats())
+
+    def test_max_retries(self):
+        error = ironicexp.Conflict()
+        func = mock.Mock(side_effect=error)
+        policy = retries.RetryPolicy(max_retries=2, delay=1, jitter=0)
+        exc = self.assertRaises(ironicexp.Conflict, policy.call, func)
+        self.assertIs(error, exc)
+        self.assertEqual(3, func.call_count)
+        self.assertEqual({'calls': 1, 'retried_calls': 1, 'retries': 2,
+                          'failures': 1}, retries.get_stats())
+
+    def test_deadline(self):
+        func = mock.Mock(side_effect=ironicexp.Conflict())
+        policy = retries.RetryPolicy(max_retries=100, delay=1, max_delay=4,
+                                     deadline=10, jitter=0)
+        self.assertRaises(ironicexp.Conflict, policy.call, func)
+        self.assertEqual([1, 2, 4, 3], self.clock.sleeps)
+        self.assertEqual(5, func.call_count)
+
+    def test_other_errors_not_retried(self):
+        func = mock.Mock(side_effect=ironicexp.NotFound())
+        policy = retries.RetryPolicy()
+        self.assertRaises(ironicexp.NotFound, policy.call, func)
+        self.assertEqual(1, func.call_count)
+        self.assertEqual({'calls': 1, 'failures': 1}, retries.get_stats())
+
+
+class RetryingIronicClientTest(base.TestCase):
+
+    def setUp(self):
+        super(RetryingIronicClientTest, self).setUp()
+        self.node_manager = mock.Mock(spec=ironic_base.Manager,
+                                      get=mock.Mock(), update=mock.Mock())
+        self.client = mock.Mock(node=self.node_manager, version='1.11')
+        self.policy = mock.Mock(spec=retries.RetryPolicy)
+
+    def test_calls_use_policy(self):
+        wrapped = retries.RetryingIronicClient(self.client, self.policy)
+        result = wrapped.node.update('uuid', [])
+        self.assertIs(self.policy.call.return_value, result)
+        self.policy.call.assert_called_once_with(self.node_manager.update,
+                                                 'uuid', [])
+
+    def test_attributes(self):
+        wrapped = retries.RetryingIronicClient(self.client, self.policy)
+        self.assertEqual('1.11', wrapped.version)
+
+    @mock.patch.object(retries, 'default_policy')
+    def test_default_policy(self, mock_policy):
+        wrapped = retries.RetryingIronicClient(self.client)
+        wrapped.node.get('uuid')
+        mock_policy.call.assert_called_once_with(self.node_manager.get,
+                                                 'uuid')
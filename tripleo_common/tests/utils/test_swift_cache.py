@@ -0,0 +1,163 @@
+# Copyright 2016 Red Hat, Inc.
+# All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+import hashlib
+import os
+import shutil
+import tempfile
+
+import mock
+from swiftclient import exceptions as swiftexceptions
+
+from tripleo_common.tests import base
+from tripleo_common.utils import swift_cache
+
+URL = 'http://swift/v1/AUTH_test/overcloud/overcloud.yaml'
+
+
+def etag(content):
+    return hashlib.md5(content).hexdigest()
+
+
+ETAG = etag(b'content')
+
+
+class ObjectCacheTest(base.TestCase):
+
+    def setUp(self):
+        super(ObjectCacheTest, self).setUp()
+        self.path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.path)
+        self.cache = swift_cache.ObjectCache(self.path)
+
+    def test_get_miss_then_hit(self):
+        fetch = mock.Mock(side_effect=[(ETAG, b'content'), None])
+        self.assertEqual(b'content', self.cache.get(URL, fetch))
+        self.assertEqual(b'content', self.cache.get(URL, fetch))
+        fetch.assert_has_calls([mock.call(None), mock.call(ETAG)])
+        self.assertEqual(1, self.cache.hits)
+        self.assertEqual(1, self.cache.misses)
+
+    def test_get_modified(self):
+        fetch = mock.Mock(side_effect=[(etag(b'old'), b'old'),
+                                       (etag(b'new'), b'new'), None])
+        self.cache.get(URL, fetch)
+        self.assertEqual(b'new', self.cache.get(URL, fetch))
+        self.assertEqual(b'new', self.cache.get(URL, fetch))
+        fetch.assert_called_with(etag(b'new'))
+
+    def test_get_without_etag_not_cached(self):
+        fetch = mock.Mock(return_value=(None, b'error'))
+        self.cache.get(URL, fetch)
+        self.cache.get(URL, fetch)
+        fetch.assert_has_calls([mock.call(None), mock.call(None)])
+        self.assertEqual([], os.listdir(self.path))
+
+    def test_evict(self):
+        self.cache.max_size = 50
+        self.cache.get(URL, lambda tag: (etag(b'x' * 10), b'x' * 10))
+        self.cache.get(URL + '2', lambda tag: (etag(b'x' * 10), b'x' * 10))
+        self.assertEqual(1, len(os.listdir(self.path)))
+
+    @mock.patch('requests.Session.request')
+    def test_request(self, mock_request):
+        mock_request.side_effect = [
+            mock.Mock(status_code=200, headers={'ETag': ETAG},
+                      content=b'content'),
+            mock.Mock(status_code=304, headers={}, content=b''),
+        ]
+        for _ in range(2):
+            self.assertEqual(b'content',
+                             self.cache.request('GET', URL, 'token'))
+        mock_request.assert_has_calls([
+            mock.call('GET', URL, headers={'X-Auth-Token': 'token'}),
+            mock.call('GET', URL, headers={'X-Auth-Token': 'token',
+                                           'If-None-Match': ETAG}),
+        ])
+
+    @mock.patch('requests.Session.request')
+    def test_request_error_not_cached(self, mock_request):
+        mock_request.return_value = mock.Mock(
+            status_code=404, headers={'ETag': etag(b'Not Found')},
+            content=b'Not Found')
+        self.assertEqual(b'Not Found',
+                         self.cache.request('GET', URL, 'token'))
+        self.assertEqual([], os.listdir(self.path))
+
+    def test_session_shared(self):
+        session = self.cache.session
+        self.assertIs(session, self.cache.session)
+        adapter = session.get_adapter(URL)
+        self.assertEqual(self.cache.pool_size, adapter._pool_maxsize)
+
+    def test_get_object(self):
+        swift = mock.Mock(url='http://swift/v1/AUTH_test')
+        swift.get_object.side_effect = [
+            ({'etag': ETAG}, b'content'),
+            swiftexceptions.ClientException('Not Modified', http_status=304),
+        ]
+        for _ in range(2):
+            self.assertEqual(b'content', self.cache.get_object(
+                swift, 'overcloud', 'overcloud.yaml'))
+        swift.get_object.assert_has_calls([
+            mock.call('overcloud', 'overcloud.yaml'),
+            mock.call('overcloud', 'overcloud.yaml',
+                      headers={'If-None-Match': ETAG}),
+        ])
+
+    def test_get_object_shared_with_request(self):
+        swift = mock.Mock(url='http://swift/v1/AUTH_test')
+        swift.get_object.return_value = ({'etag': ETAG}, b'content')
+        self.cache.get_object(swift, 'overcloud', 'overcloud.yaml',
+                              project='test')
+        fetch = mock.Mock(return_value=None)
+        self.assertEqual(b'content', self.cache.get(URL, fetch,
+                                                    project='test'))
+        fetch.assert_called_once_with(ETAG)
+
+    def test_get_object_error(self):
+        swift = mock.Mock(url='http://swift/v1/AUTH_test')
+        swift.get_object.side_effect = swiftexceptions.ClientException(
+            'Not Found', http_status=404)
+        self.assertRaises(swiftexceptions.ClientException,
+                          self.cache.get_object, swift, 'overcloud',
+                          'overcloud.yaml')
+
+    def test_get_per_project(self):
+        self.cache.get(URL, lambda tag: (ETAG, b'content'), project='test')
+        fetch = mock.Mock(return_value=(etag(b'other'), b'other'))
+        self.assertEqual(b'other', self.cache.get(URL, fetch,
+                                                  project='other'))
+        fetch.assert_called_once_with(None)
+
+    def test_get_tampered(self):
+        self.cache.get(URL, lambda tag: (ETAG, b'content'))
+        path = os.path.join(self.path, os.listdir(self.path)[0])
+        with open(path, 'wb') as f:
+            f.write(ETAG.encode('utf-8') + b'\nevil')
+        fetch = mock.Mock(return_value=(ETAG, b'content'))
+        self.assertEqual(b'content', self.cache.get(URL, fetch))
+        fetch.assert_called_once_with(None)
+
+    def test_etag_not_md5_not_cached(self):
+        self.cache.get(URL, lambda tag: ('"manifest"', b'content'))
+        self.assertEqual([], os.listdir(self.path))
+
+    def test_directory_not_private(self):
+        os.chmod(self.path, 0o777)
+        fetch = mock.Mock(return_value=(ETAG, b'content'))
+        for _ in range(2):
+            self.assertEqual(b'content', self.cache.get(URL, fetch))
+        fetch.assert_has_calls([mock.call(None), mock.call(None)])
+        self.assertEqual([], os.listdir(self.path))
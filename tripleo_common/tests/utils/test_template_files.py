@@ -0,0 +1,132 @@
+# Copyright 2016 Red Hat, Inc.
+# All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+import mock
+
+from tripleo_common.tests import base
+from tripleo_common.utils import template_files
+
+BASE = 'http://swift/v1/AUTH_test/overcloud/'
+
+TEMPLATE = b"""
+heat_template_version: 2016-04-30
+resources:
+  Controller:
+    type: puppet/controller.yaml
+  Config:
+    type: OS::Heat::SoftwareConfig
+    properties:
+      config: {get_file: scripts/run.sh}
+  Group:
+    type: OS::Heat::ResourceGroup
+    properties:
+      resource_def:
+        type: ../shared/compute.template
+"""
+
+ENVIRONMENT = b"""
+resource_registry:
+  OS::TripleO::Compute: ../puppet/compute.yaml
+  OS::TripleO::Alias: OS::Heat::None
+  resources:
+    my_server:
+      hooks: pre-create
+      OS::TripleO::Server: server.yaml
+parameter_defaults:
+  ComputeCount: 1
+"""
+
+
+class ReferencesTest(base.TestCase):
+
+    def test_template(self):
+        self.assertEqual({
+            BASE + 'puppet/controller.yaml',
+            BASE + 'scripts/run.sh',
+            'http://swift/v1/AUTH_test/shared/compute.template',
+        }, template_files.references(TEMPLATE, BASE + 'overcloud.yaml'))
+
+    def test_environment(self):
+        self.assertEqual({
+            BASE + 'puppet/compute.yaml',
+            BASE + 'environments/server.yaml',
+        }, template_files.references(ENVIRONMENT,
+                                     BASE + 'environments/env.yaml',
+                                     environment=True))
+
+    def test_environment_base_url(self):
+        env = b"""
+resource_registry:
+  base_url: http://other/templates/
+  OS::TripleO::Compute: compute.yaml
+"""
+        self.assertEqual(
+            {'http://other/templates/compute.yaml'},
+            template_files.references(env, BASE + 'env.yaml',
+                                      environment=True))
+
+    def test_not_a_template(self):
+        self.assertEqual(set(), template_files.references(
+            b'type: foo.yaml', BASE + 'data.yaml'))
+        self.assertEqual(set(), template_files.references(
+            b'#!/bin/bash\necho "{"', BASE + 'run.sh'))
+
+
+class PrefetchTest(base.TestCase):
+
+    def setUp(self):
+        super(PrefetchTest, self).setUp()
+        self.files = {
+            BASE + 'overcloud.yaml': TEMPLATE,
+            BASE + 'puppet/controller.yaml': (
+                b'heat_template_version: 2016-04-30\n'
+                b'resources:\n'
+                b'  Config: {type: ../overcloud.yaml}\n'),
+            BASE + 'scripts/run.sh': b'#!/bin/bash',
+            BASE + 'environments/env.yaml': ENVIRONMENT,
+            BASE + 'puppet/compute.yaml': (
+                b'heat_template_version: 2016-04-30\n'
+                b'resources:\n'
+                b'  Config: {type: ../missing.yaml}\n'),
+        }
+        self.fetch = mock.Mock(side_effect=self._fetch)
+
+    def _fetch(self, url):
+        try:
+            return self.files[url]
+        except KeyError:
+            raise Exception('404 Not Found')
+
+    def test_prefetch(self):
+        result = template_files.prefetch(
+            [BASE + 'overcloud.yaml'], [BASE + 'environments/env.yaml'],
+            self.fetch, url_filter=lambda url: url.startswith(BASE),
+            concurrency=4)
+
+        self.assertEqual(self.files, result)
+        fetched = [c[0][0] for c in self.fetch.call_args_list]
+        # Every file is only fetched once, even when it failed
+        self.assertEqual(sorted(set(fetched)), sorted(fetched))
+        self.assertIn(BASE + 'missing.yaml', fetched)
+        self.assertIn(BASE + 'environments/server.yaml', fetched)
+        self.assertNotIn('http://swift/v1/AUTH_test/shared/compute.template',
+                         fetched)
+
+    def test_prefetch_serial(self):
+        result = template_files.prefetch(
+            [BASE + 'overcloud.yaml'], [], self.fetch, concurrency=1)
+        self.assertEqual(mock.call(BASE + 'overcloud.yaml'),
+                         self.fetch.call_args_list[0])
+        self.assertEqual(TEMPLATE, result[BASE + 'overcloud.yaml'])
+        self.assertNotIn(BASE + 'environments/env.yaml', result)
@@ -0,0 +1,63 @@
+# Copyright 2016 Red Hat, Inc.
+# All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import mock
+
+from tripleo_common.tests import base
+from tripleo_common.utils import waiter
+
+
+class WaiterTest(base.TestCase):
+
+    def setUp(self):
+        super(WaiterTest, self).setUp()
+        self.clock = self.use_fake_clock()
+
+    def test_wait_success(self):
+        condition = mock.Mock(side_effect=[False, False, True])
+        w = waiter.Waiter(delay=1, backoff=2, jitter=0)
+        self.assertTrue(w.wait(condition))
+        self.assertEqual(3, w.polls)
+        self.assertEqual([1, 2], self.clock.sleeps)
+        self.assertEqual(3, w.elapsed)
+
+    def test_wait_deadline(self):
+        condition = mock.Mock(return_value=False)
+        w = waiter.Waiter(timeout=20, delay=1, max_delay=8, jitter=0)
+        self.assertFalse(w.wait(condition))
+        self.assertEqual([1, 2, 4, 8, 5], self.clock.sleeps)
+        self.assertEqual(6, w.polls)
+        self.assertEqual(20, w.elapsed)
+
+    def test_wait_max_polls(self):
+        condition = mock.Mock(return_value=False)
+        w = waiter.Waiter.fixed(3, 2)
+        self.assertFalse(w.wait(condition))
+        self.assertEqual([2, 2], self.clock.sleeps)
+        self.assertEqual(3, w.polls)
+
+    def test_wait_jitter(self):
+        condition = mock.Mock(side_effect=[False, True])
+        w = waiter.Waiter(delay=10, jitter=0.5)
+        with mock.patch('random.uniform', return_value=-0.5) as uniform:
+            self.assertTrue(w.wait(condition))
+        uniform.assert_called_once_with(-0.5, 0.5)
+        self.assertEqual([5], self.clock.sleeps)
+
+    def test_wait_error(self):
+        condition = mock.Mock(side_effect=[False, RuntimeError('boom')])
+        w = waiter.Waiter(timeout=60, jitter=0)
+        self.assertRaises(RuntimeError, w.wait, condition)
+        self.assertEqual(2, w.polls)
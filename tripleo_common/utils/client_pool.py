@@ -0,0 +1,117 @@
+# Copyright 2016 Red Hat, Inc.
+# All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+import calendar
+import collections
+import logging
+import threading
+import time
+
+from oslo_utils import timeutils
+import six
+
+LOG = logging.getLogger(__name__)
+
+#: Maximum number of clients kept in the pool
+CLIENT_POOL_SIZE = 32
+
+#: Maximum time (in seconds) a client is kept in the pool
+CLIENT_POOL_TTL = 600
+
+#: Clients are dropped this many seconds before their token expires
+TOKEN_EXPIRY_MARGIN = 60
+
+
+def token_expiry(expires_at):
+    """Convert a token expiration time to a timestamp.
+
+    :param expires_at: ISO 8601 expiration time, as found in the context.
+    :return: the expiration time in seconds since the epoch, or None if it
+             is unknown.
+    """
+    if not isinstance(expires_at, six.string_types):
+        return None
+    try:
+        expiry = timeutils.parse_isotime(expires_at)
+    except ValueError:
+        LOG.debug('Cannot parse token expiration time %s', expires_at)
+        return None
+    return calendar.timegm(expiry.utctimetuple())
+
+
+class ClientPool(object):
+    """A bounded pool of service clients, reused until they expire.
+
+    Clients are looked up by a key which should include everything they
+    were built from, such as the service, project and token. When the pool
+    is full, the least recently used client is dropped.
+
+    :param max_size: Maximum number of clients in the pool.
+    :param ttl: Maximum time (in seconds) a client is kept in the pool.
+    """
+
+    def __init__(self, max_size=None, ttl=None):
+        self.max_size = CLIENT_POOL_SIZE if max_size is None else max_size
+        self.ttl = CLIENT_POOL_TTL if ttl is None else ttl
+        # key -> (expiry time, client)
+        self._clients = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._clients)
+
+    def clear(self):
+        with self._lock:
+            self._clients.clear()
+
+    def get(self, key, factory, expires_at=None):
+        """Return the client for key, creating it with factory if needed.
+
+        :param key: Hashable key identifying the client.
+        :param factory: Callable without arguments creating the client.
+        :param expires_at: When the credentials of the client expire (in
+                           seconds since the epoch), if known.
+        """
+        now = time.time()
+        with self._lock:
+            try:
+                expiry, client = self._clients.pop(key)
+            except KeyError:
+                pass
+            else:
+                if expiry > now:
+                    self._clients[key] = (expiry, client)
+                    return client
+
+        client = factory()
+
+        expiry = now + self.ttl
+        if expires_at is not None:
+            expiry = min(expiry, expires_at - TOKEN_EXPIRY_MARGIN)
+        if expiry <= now or self.max_size <= 0:
+            return client
+
+        with self._lock:
+            self._clients[key] = (expiry, client)
+            while len(self._clients) > self.max_size:
+                self._clients.popitem(last=False)
+        return client
+
+
+_pool = ClientPool()
+
+
+def get_pool():
+    """Return the client pool shared by the process."""
+    return _pool
@@ -0,0 +1,47 @@
+# Copyright 2016 Red Hat, Inc.
+# All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+import logging
+
+import futurist
+
+LOG = logging.getLogger(__name__)
+
+
+def map_concurrently(func, items, concurrency=1):
+    """Call func on every item using at most concurrency worker threads.
+
+    With a concurrency of 1 (or less) the calls are made serially in the
+    calling thread.
+
+    :param func: callable taking a single item.
+    :param items: iterable of items to process.
+    :param concurrency: maximum number of calls running at the same time.
+    :return: list of futures, in the same order as items. Exceptions raised
+             by func are stored in the corresponding future.
+    """
+    items = list(items)
+    if concurrency > 1 and len(items) > 1:
+        executor = futurist.ThreadPoolExecutor(
+            max_workers=min(concurrency, len(items)))
+    else:
+        executor = futurist.SynchronousExecutor()
+
+    LOG.debug('Processing %d items with concurrency %d',
+              len(items), concurrency)
+    try:
+        futures = [executor.submit(func, item) for item in items]
+    finally:
+        executor.shutdown(wait=True)
+    return futures
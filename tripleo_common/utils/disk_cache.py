@@ -0,0 +1,164 @@
+# Copyright 2016 Red Hat, Inc.
+# All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+import logging
+import os
+import stat
+import tempfile
+
+LOG = logging.getLogger(__name__)
+
+
+def default_directory(name):
+    """Return the default directory of a cache, private to the current user.
+
+    :param name: The name of the cache, e.g. 'tripleo-plans'.
+    """
+    return os.path.join(tempfile.gettempdir(),
+                        '%s-%d' % (name, os.geteuid()))
+
+
+def ensure_private_directory(path):
+    """Create a cache directory only the current user can access.
+
+    Cached files are trusted when they are read back, so a directory which
+    other users could have created or could write to must not be used.
+
+    :param path: The path of the directory.
+    :raises OSError: if the directory cannot be created, or if it exists but
+                     is not a directory owned by the current user and closed
+                     to other users.
+    """
+    parent = os.path.dirname(path)
+    if parent and not os.path.isdir(parent):
+        os.makedirs(parent)
+    try:
+        os.mkdir(path, 0o700)
+    except OSError:
+        if not os.path.isdir(path):
+            raise
+
+    # lstat, so that a symlink planted in place of the directory is refused
+    st = os.lstat(path)
+    if not stat.S_ISDIR(st.st_mode):
+        raise OSError('Cache directory %s is not a directory' % path)
+    if st.st_uid != os.geteuid():
+        raise OSError('Cache directory %s is owned by another user (uid %d)'
+                      % (path, st.st_uid))
+    if st.st_mode & 0o077:
+        raise OSError('Cache directory %s is accessible to other users '
+                      '(mode %o)' % (path, stat.S_IMODE(st.st_mode)))
+
+
+class PrivateDirectory(object):
+    """The directory of a cache, checked once before it is first used.
+
+    Cached files are trusted when they are read back, so the directory must
+    only be accessible to the current user, see ensure_private_directory.
+    Otherwise the cache is not used at all. Caches default to a directory
+    of the system temporary directory named after the cache and the user,
+    see default_directory.
+
+    :param path: The path of the directory.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._available = None
+
+    def available(self):
+        """Return whether the directory is safe to use, creating it if needed.
+
+        When it is not, a warning is logged once and the cache should behave
+        as if it was empty.
+        """
+        if self._available is None:
+            try:
+                ensure_private_directory(self.path)
+                self._available = True
+            except OSError as exc:
+                LOG.warning('Not using cache directory %s: %s',
+                            self.path, exc)
+                self._available = False
+        return self._available
+
+
+def atomic_write(path, content):
+    """Write content to path, so that readers never see a partial file.
+
+    The parent directories of path are created if needed.
+
+    :param path: The path of the file.
+    :param content: The bytes to write.
+    """
+    directory = os.path.dirname(path)
+    if not os.path.isdir(directory):
+        try:
+            os.makedirs(directory)
+        except OSError:
+            if not os.path.isdir(directory):
+                raise
+    fd, tmp_path = tempfile.mkstemp(dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(content)
+        os.rename(tmp_path, path)
+    except Exception:
+        os.unlink(tmp_path)
+        raise
+
+
+def touch(path):
+    """Mark a cached file as recently used."""
+    try:
+        os.utime(path, None)
+    except OSError:
+        pass
+
+
+def evict_lru(directory, max_size):
+    """Remove the least recently used files over a total size.
+
+    Files are considered used when they are modified, see touch().
+
+    :param directory: The directory containing the cached files.
+    :param max_size: The maximum total size (in bytes) of the files.
+    :return: list of the names of the removed files.
+    """
+    try:
+        names = os.listdir(directory)
+    except OSError:
+        return []
+
+    files = []
+    for name in names:
+        try:
+            stat = os.stat(os.path.join(directory, name))
+        except OSError:
+            continue
+        files.append((stat.st_mtime, stat.st_size, name))
+
+    removed = []
+    total = sum(size for _mtime, size, _name in files)
+    for _mtime, size, name in sorted(files):
+        if total <= max_size:
+            break
+        try:
+            os.unlink(os.path.join(directory, name))
+        except OSError:
+            continue
+        LOG.debug('Removed cached file %s', name)
+        removed.append(name)
+        total -= size
+    return removed
@@ -0,0 +1,89 @@
+# Copyright 2016 Red Hat, Inc.
+# All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+import logging
+import threading
+import time
+
+from mistral import context
+from mistral.utils.openstack import keystone as keystone_utils
+
+LOG = logging.getLogger(__name__)
+
+#: How long (in seconds) the endpoints found in the catalog are cached
+ENDPOINT_CACHE_TTL = 300
+
+
+class EndpointCache(object):
+    """Cache of the endpoints found in the Keystone catalog.
+
+    Endpoints are cached per project, service and region. The number of
+    cache hits and misses are counted in the ``hits`` and ``misses``
+    attributes.
+
+    :param ttl: How long (in seconds) endpoints are cached.
+    """
+
+    def __init__(self, ttl=None):
+        self.ttl = ENDPOINT_CACHE_TTL if ttl is None else ttl
+        self.hits = 0
+        self.misses = 0
+        # (project, service, region) -> (expiry time, endpoint)
+        self._endpoints = {}
+        self._lock = threading.Lock()
+
+    def clear(self):
+        with self._lock:
+            self._endpoints.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def get(self, service_name, ctx=None):
+        """Return the endpoint of a service for the project of the context.
+
+        :param service_name: The name of the service, e.g. 'ironic'.
+        :param ctx: The context of the action, defaults to the current one.
+        """
+        if ctx is None:
+            ctx = context.ctx()
+        key = (ctx.project_id, service_name, getattr(ctx, 'region_name', None))
+        now = time.time()
+        with self._lock:
+            cached = self._endpoints.get(key)
+            if cached is not None and cached[0] > now:
+                self.hits += 1
+                return cached[1]
+            self.misses += 1
+
+        endpoint = keystone_utils.get_endpoint_for_project(service_name)
+        with self._lock:
+            self._endpoints[key] = (now + self.ttl, endpoint)
+        LOG.debug('Found endpoint of %(service)s in the catalog '
+                  '(%(hits)d hits, %(misses)d misses)',
+                  {'service': service_name, 'hits': self.hits,
+                   'misses': self.misses})
+        return endpoint
+
+
+_cache = EndpointCache()
+
+
+def get_cache():
+    """Return the endpoint cache shared by the process."""
+    return _cache
+
+
+def get_endpoint_for_project(service_name, ctx=None):
+    """Like keystone_utils.get_endpoint_for_project, but cached."""
+    return _cache.get(service_name, ctx=ctx)
@@ -14,9 +14,74 @@
 # limitations under the License.
 
 import collections
+import hashlib
+import logging
+import time
 
 from glanceclient import exc as exceptions
 from glanceclient.v2.client import Client as real_glance_client
+from oslo_utils import units
+
+LOG = logging.getLogger(__name__)
+
+#: How long (in seconds) the images found in Glance are cached
+IMAGE_CACHE_TTL = 60
+
+#: How many images to fetch per request when looking up an image
+IMAGE_LOOKUP_PAGE_SIZE = 10
+
+#: Size of the chunks read from disk when uploading an image
+IMAGE_UPLOAD_CHUNK_SIZE = 64 * units.Ki
+
+# (endpoint, project, name, disk_format) -> (expiry time, image)
+_image_cache = {}
+
+
+def clear_image_cache():
+    """Forget all the images cached by create_or_find_kernel_and_ramdisk."""
+    _image_cache.clear()
+
+
+def _image_cache_key(glanceclient, name, disk_format):
+    """Return the key of an image in the cache, or None to not cache it.
+
+    Images are cached per Glance endpoint and project. When the client does
+    not tell its project, its token (which is scoped to a single project)
+    is used instead.
+    """
+    http_client = getattr(glanceclient, 'http_client', None)
+    endpoint = (getattr(http_client, 'endpoint', None) or
+                getattr(http_client, 'endpoint_override', None))
+    project = None
+    if hasattr(http_client, 'get_project_id'):
+        try:
+            project = http_client.get_project_id()
+        except Exception:
+            project = None
+    if project is None:
+        project = getattr(http_client, 'auth_token', None)
+    if endpoint is None or project is None:
+        return None
+    return endpoint, project, name, disk_format
+
+
+def _get_cached_image(key):
+    if key is None:
+        return
+    try:
+        expiry, image = _image_cache[key]
+    except KeyError:
+        return
+    if expiry < time.time():
+        _image_cache.pop(key, None)
+        return
+    LOG.debug('Using cached %s image %s', key[3], key[2])
+    return image
+
+
+def _cache_image(key, image):
+    if key is not None:
+        _image_cache[key] = (time.time() + IMAGE_CACHE_TTL, image)
 
 
 def create_or_find_kernel_and_ramdisk(glanceclient, kernel_name, ramdisk_name,
@@ -27,6 +92,10 @@ def create_or_find_kernel_and_ramdisk(glanceclient, kernel_name, ramdisk_name,
     If either kernel_path or ramdisk_path is None, they will not be created,
     and an exception will be raised if it does not exist in Glance.
 
+    The images found or created are cached for IMAGE_CACHE_TTL seconds per
+    Glance endpoint and project, so that configuring many nodes does not
+    list the Glance images every time.
+
     :param glanceclient: A client for Glance.
     :param kernel_name: Name to search for or create for the kernel.
     :param ramdisk_name: Name to search for or create for the ramdisk.
@@ -44,36 +113,178 @@ def create_or_find_kernel_and_ramdisk(glanceclient, kernel_name, ramdisk_name,
     return {'kernel': kernel_image.id, 'ramdisk': ramdisk_image.id}
 
 
-def _upload_file(glanceclient, name, path, disk_format, type_name,
-                 skip_missing=False):
-    image_tuple = collections.namedtuple('image', ['id'])
+def _find_image(glanceclient, name, disk_format):
+    """Return the newest active image with the given name and disk format.
+
+    :raises glanceclient.exc.NotFound: if no such image exists.
+    """
+    start = time.time()
     try:
         if isinstance(glanceclient, real_glance_client):
-            images = glanceclient.images.list(name=name,
-                                              disk_format=disk_format)
-            image = None
+            # Let Glance do the filtering and sorting, and only fetch a
+            # small page: the first match is the one we want.
+            images = glanceclient.images.list(
+                filters={'name': name, 'disk_format': disk_format,
+                         'status': 'active'},
+                sort_key=['created_at', 'id'], sort_dir=['desc', 'desc'],
+                page_size=IMAGE_LOOKUP_PAGE_SIZE)
             for img in images:
-                if img['name'] == name and img['disk_format'] == disk_format:
-                    image = img
-            if not image:
-                raise exceptions.NotFound("No image found")
+                if (img['name'] == name and
+                        img['disk_format'] == disk_format and
+                        img['status'] == 'active'):
+                    return img
+            raise exceptions.NotFound("No image found")
         else:
             # TODO(dprince) remove this
             # This code expects the python-openstackclient version of
             # "glanceclient" (which isn't pure python-glanceclient) and is
             # here for backwards compat until python-tripleoclient starts
             # using the Mistral API for this functionality.
-            image = glanceclient.images.find(name=name,
-                                             disk_format=disk_format)
+            return glanceclient.images.find(name=name,
+                                            disk_format=disk_format)
+    finally:
+        LOG.debug('Looking up %s image %s took %.3f seconds',
+                  disk_format, name, time.time() - start)
+
+
+class _ChecksummedFile(object):
+    """Read a file in fixed-size chunks, computing its MD5 on the way.
+
+    Both iterating and reading (as glanceclient does with request bodies)
+    are supported. The file is only read once.
+    """
+
+    def __init__(self, path, chunk_size=IMAGE_UPLOAD_CHUNK_SIZE):
+        self.path = path
+        self.chunk_size = chunk_size
+        self.size = 0
+        self._md5 = hashlib.md5()
+        self._file = None
+        self._eof = False
+
+    @property
+    def checksum(self):
+        return self._md5.hexdigest()
+
+    def read(self, size=-1):
+        if self._eof:
+            return b''
+        if self._file is None:
+            self._file = open(self.path, 'rb')
+        chunk = self._file.read(size)
+        if chunk:
+            self._md5.update(chunk)
+            self.size += len(chunk)
+        else:
+            self.close()
+        return chunk
+
+    def close(self):
+        self._eof = True
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __iter__(self):
+        while True:
+            chunk = self.read(self.chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+
+def _file_checksum(path):
+    reader = _ChecksummedFile(path)
+    for _chunk in reader:
+        pass
+    return reader.checksum
+
+
+def _find_image_by_checksum(glanceclient, checksum, disk_format):
+    images = glanceclient.images.list(
+        filters={'checksum': checksum, 'disk_format': disk_format,
+                 'status': 'active'},
+        page_size=IMAGE_LOOKUP_PAGE_SIZE)
+    for img in images:
+        if isinstance(img, dict):
+            found = (img.get('checksum'), img.get('disk_format'))
+        else:
+            found = (getattr(img, 'checksum', None),
+                     getattr(img, 'disk_format', None))
+        if found == (checksum, disk_format):
+            return img
+
+
+def _create_image(glanceclient, name, path, disk_format):
+    """Upload path as a new image, unless its content is already in Glance.
+
+    The file is streamed in IMAGE_UPLOAD_CHUNK_SIZE chunks and its checksum
+    is computed while reading it.
+    """
+    checksum = _file_checksum(path)
+    image = _find_image_by_checksum(glanceclient, checksum, disk_format)
+    if image is not None:
+        LOG.info('Image %s already has the content of %s (checksum %s), '
+                 'not uploading it again', image.id, path, checksum)
+        return image
+
+    data = _ChecksummedFile(path)
+    start = time.time()
+    if isinstance(glanceclient, real_glance_client):
+        image = glanceclient.images.create(
+            name=name, disk_format=disk_format,
+            container_format=disk_format, visibility='public')
+        try:
+            glanceclient.images.upload(image.id, data)
+        except Exception:
+            # Do not leave a queued image behind: it would never be found
+            # by _find_image, and every retry would create another one.
+            LOG.error('Uploading %s as image %s failed, deleting it',
+                      path, image.id)
+            try:
+                glanceclient.images.delete(image.id)
+            except Exception as exc:
+                LOG.warning('Unable to delete image %s: %s', image.id, exc)
+            raise
+        finally:
+            data.close()
+    else:
+        image = glanceclient.images.create(
+            name=name, disk_format=disk_format, is_public=True,
+            data=data)
+        data.close()
+    elapsed = time.time() - start
+
+    if data.checksum != checksum:
+        LOG.warning('%s changed while being uploaded to Glance as %s',
+                    path, name)
+    LOG.info('Uploaded %(path)s as image %(name)s: %(size)d bytes in '
+             '%(elapsed).1f seconds (%(rate).1f MiB/s)',
+             {'path': path, 'name': name, 'size': data.size,
+              'elapsed': elapsed,
+              'rate': data.size / units.Mi / max(elapsed, 0.001)})
+    return image
+
+
+def _upload_file(glanceclient, name, path, disk_format, type_name,
+                 skip_missing=False):
+    image_tuple = collections.namedtuple('image', ['id'])
+    cache_key = _image_cache_key(glanceclient, name, disk_format)
+    image = _get_cached_image(cache_key)
+    if image is not None:
+        return image
+
+    try:
+        image = _find_image(glanceclient, name, disk_format)
     except exceptions.NotFound:
         if path:
-            image = glanceclient.images.create(
-                name=name, disk_format=disk_format, is_public=True,
-                data=open(path, 'rb'))
+            image = _create_image(glanceclient, name, path, disk_format)
         else:
             if skip_missing:
-                image = image_tuple(None)
+                return image_tuple(None)
             else:
                 raise ValueError("%s image not found in Glance, and no path "
                                  "specified." % type_name)
+
+    _cache_image(cache_key, image)
     return image
@@ -0,0 +1,156 @@
+# Copyright 2016 Red Hat, Inc.
+# All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+import hashlib
+import json
+import logging
+import os
+import threading
+
+import six
+
+from tripleo_common import constants
+from tripleo_common.utils import disk_cache
+
+LOG = logging.getLogger(__name__)
+
+
+class IntrospectionDataCache(object):
+    """On-disk cache of introspection data.
+
+    The data is stored once per distinct content, in a file named after its
+    SHA-256 digest. For every node a small index file records which data
+    belongs to which inspection (identified by its finish time), so the data
+    of a node is only downloaded again after it is introspected again.
+
+    When the stored data grows over max_size bytes, the least recently used
+    data is removed.
+
+    :param path: The directory to store the data in, see
+                 disk_cache.PrivateDirectory.
+    :param max_size: The maximum size (in bytes) of the stored data.
+    """
+
+    def __init__(self, path=None, max_size=None):
+        if path is None:
+            path = (constants.INTROSPECTION_DATA_CACHE_DIR or
+                    disk_cache.default_directory(
+                        'tripleo-introspection-data'))
+        if max_size is None:
+            max_size = constants.INTROSPECTION_DATA_CACHE_SIZE
+        self.path = path
+        self.max_size = max_size
+        self._directory = disk_cache.PrivateDirectory(path)
+        self._lock = threading.Lock()
+
+    def _data_path(self, digest):
+        return os.path.join(self.path, 'data', digest + '.json')
+
+    def _node_path(self, node_uuid):
+        return os.path.join(self.path, 'nodes', node_uuid + '.json')
+
+    def get(self, node_uuid, finished_at):
+        """Return the cached data of a node, or None.
+
+        :param node_uuid: The UUID of the node.
+        :param finished_at: When the inspection of the node finished.
+        """
+        if not self._directory.available():
+            return None
+        try:
+            with open(self._node_path(node_uuid), 'rb') as f:
+                index = json.loads(f.read().decode('utf-8'))
+            if index.get('finished_at') != finished_at:
+                return None
+            data_path = self._data_path(index['digest'])
+            with open(data_path, 'rb') as f:
+                content = f.read()
+        except (IOError, OSError, ValueError, KeyError):
+            return None
+
+        if hashlib.sha256(content).hexdigest() != index['digest']:
+            LOG.warning('Cached introspection data of node %s is corrupted',
+                        node_uuid)
+            return None
+        # Record the access for the eviction
+        disk_cache.touch(data_path)
+        return json.loads(content.decode('utf-8'))
+
+    def put(self, node_uuid, finished_at, data):
+        """Store the data of a node.
+
+        :param node_uuid: The UUID of the node.
+        :param finished_at: When the inspection of the node finished.
+        :param data: The introspection data, as returned by ironic-inspector.
+        """
+        if not self._directory.available():
+            return
+        content = json.dumps(data, sort_keys=True).encode('utf-8')
+        digest = hashlib.sha256(content).hexdigest()
+        data_path = self._data_path(digest)
+        if not os.path.exists(data_path):
+            disk_cache.atomic_write(data_path, content)
+        disk_cache.atomic_write(self._node_path(node_uuid), json.dumps(
+            {'finished_at': finished_at, 'digest': digest}).encode('utf-8'))
+        self.evict()
+
+    def evict(self):
+        """Remove the least recently used data over the size limit."""
+        with self._lock:
+            disk_cache.evict_lru(os.path.join(self.path, 'data'),
+                                 self.max_size)
+
+
+_default_cache = None
+
+
+def get_cache():
+    """Return the introspection data cache shared by the process."""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = IntrospectionDataCache()
+    return _default_cache
+
+
+def get_data(inspector_client, node_uuid, cache=None):
+    """Get the introspection data of a node, using the cache if possible.
+
+    The inspection status is fetched to find out when the node was last
+    introspected; the (much larger) data is only downloaded when it is not
+    already cached for this inspection.
+
+    :param inspector_client: A client for ironic-inspector.
+    :param node_uuid: The UUID of the node.
+    :param cache: An IntrospectionDataCache, defaults to the shared one.
+    :return: The introspection data.
+    """
+    finished_at = inspector_client.get_status(node_uuid).get('finished_at')
+    if not isinstance(finished_at, six.string_types):
+        # The inspection is not finished, so there is nothing to cache
+        return inspector_client.get_data(node_uuid)
+
+    if cache is None:
+        cache = get_cache()
+    data = cache.get(node_uuid, finished_at)
+    if data is not None:
+        LOG.debug('Using cached introspection data of node %s', node_uuid)
+        return data
+
+    data = inspector_client.get_data(node_uuid)
+    try:
+        cache.put(node_uuid, finished_at, data)
+    except (IOError, OSError) as exc:
+        LOG.warning('Unable to cache introspection data of node %s: %s',
+                    node_uuid, exc)
+    return data
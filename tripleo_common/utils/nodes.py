@@ -13,15 +13,20 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import codecs
+import collections
+import json
 import logging
 import re
-import time
 
 from ironicclient import exc as ironicexp
 import six
 
+from tripleo_common import constants
 from tripleo_common import exception
+from tripleo_common.utils import concurrency as concurrency_utils
 from tripleo_common.utils import glance
+from tripleo_common.utils import waiter as waiter_utils
 
 LOG = logging.getLogger(__name__)
 
@@ -189,14 +194,37 @@ DRIVER_INFO = {
 }
 
 
+_DRIVER_PATTERNS = [(re.compile(driver_tpl), handler)
+                    for driver_tpl, handler in sorted(DRIVER_INFO.items(),
+                                                      key=lambda i: i[0])]
+
+# Driver name -> handler, filled by _find_driver_handler
+_DRIVER_HANDLERS = {}
+
+
 def _find_driver_handler(driver):
-    for driver_tpl, handler in DRIVER_INFO.items():
-        if re.match(driver_tpl, driver) is not None:
-            return handler
+    try:
+        return _DRIVER_HANDLERS[driver]
+    except KeyError:
+        pass
+
+    # If several patterns match, prefer the one matching the longest part of
+    # the driver name, then the first pattern in alphabetical order.
+    candidates = []
+    for pattern, handler in _DRIVER_PATTERNS:
+        match = pattern.match(driver)
+        if match is not None:
+            candidates.append((-len(match.group(0)), pattern.pattern,
+                               handler))
 
-    # FIXME(dtantsur): handle all drivers without hardcoding them
-    raise exception.InvalidNode('unknown pm_type (ironic driver to use): '
-                                '%s' % driver)
+    if not candidates:
+        # FIXME(dtantsur): handle all drivers without hardcoding them
+        raise exception.InvalidNode('unknown pm_type (ironic driver to use): '
+                                    '%s' % driver)
+
+    handler = min(candidates, key=lambda c: c[:2])[2]
+    _DRIVER_HANDLERS[driver] = handler
+    return handler
 
 
 def _find_node_handler(fields):
@@ -208,6 +236,173 @@ def _find_node_handler(fields):
     return _find_driver_handler(driver)
 
 
+class _JSONStream(object):
+    """Decode JSON values one by one from an iterable of chunks."""
+
+    _WHITESPACE = ' \t\n\r'
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._decoder = json.JSONDecoder()
+        self._text_decoder = codecs.getincrementaldecoder('utf-8')()
+        self._buffer = ''
+        self._pos = 0
+        # Position of the start of the buffer in the document
+        self._offset = 0
+        self._eof = False
+
+    def _read_more(self):
+        if self._eof:
+            return False
+        # Drop what was already consumed to keep memory usage flat
+        self._buffer = self._buffer[self._pos:]
+        self._offset += self._pos
+        self._pos = 0
+        try:
+            chunk = next(self._chunks)
+        except StopIteration:
+            self._eof = True
+            self._buffer += self._text_decoder.decode(b'', final=True)
+            return True
+        if isinstance(chunk, six.binary_type):
+            chunk = self._text_decoder.decode(chunk)
+        self._buffer += chunk
+        return True
+
+    def peek(self):
+        """Return the next non-whitespace character, or None at the end."""
+        while True:
+            end = len(self._buffer)
+            while (self._pos < end and
+                   self._buffer[self._pos] in self._WHITESPACE):
+                self._pos += 1
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._read_more():
+                return None
+
+    def expect(self, char):
+        found = self.peek()
+        if found is None:
+            raise ValueError('Unexpected end of input at character %d of '
+                             'the nodes JSON, expected %r'
+                             % (self._offset + self._pos, char))
+        if found != char:
+            raise ValueError('Expected %r at character %d of the nodes JSON'
+                             % (char, self._offset + self._pos))
+        self._pos += 1
+
+    def value(self):
+        """Decode the next complete JSON value."""
+        self.peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer,
+                                                      self._pos)
+            except ValueError:
+                if not self._read_more():
+                    raise
+                continue
+            # A number at the end of the buffer might not be complete yet
+            if end == len(self._buffer) and not self._eof:
+                self._read_more()
+                continue
+            self._pos = end
+            return value
+
+
+def iter_nodes_json(chunks):
+    """Incrementally parse the nodes of an instackenv JSON document.
+
+    Both the instackenv format (an object with a ``nodes`` list) and a
+    plain list of nodes are accepted. Only the node being parsed is kept in
+    memory, so arbitrarily large inventories can be processed.
+
+    :param chunks: iterable of text or UTF-8 encoded chunks, e.g. the body
+                   returned by swiftclient's get_object with resp_chunk_size.
+    :return: generator of node dictionaries.
+    :raises ValueError: if the document is not valid JSON or has no list of
+                        nodes.
+    """
+    stream = _JSONStream(chunks)
+
+    if stream.peek() == '{':
+        stream.expect('{')
+        while True:
+            if stream.peek() == '}':
+                raise ValueError('No nodes list found in the nodes JSON')
+            key = stream.value()
+            stream.expect(':')
+            if key == 'nodes':
+                break
+            # Skip any other instackenv field
+            stream.value()
+            if stream.peek() != '}':
+                stream.expect(',')
+
+    stream.expect('[')
+    if stream.peek() == ']':
+        return
+    while True:
+        yield stream.value()
+        if stream.peek() == ']':
+            return
+        stream.expect(',')
+
+
+def _normalize_mac(mac):
+    return six.text_type(mac).strip().lower().replace('-', ':')
+
+
+def validate_nodes(nodes_list):
+    """Check that every node in nodes_list can be registered.
+
+    All nodes are checked in one pass, so every invalid node is reported
+    before anything gets written to Ironic. Besides the per-node checks,
+    the MAC addresses, BMC addresses, names and UUIDs are indexed to find
+    the ones used by several nodes.
+
+    :param nodes_list: iterable of nodes in the instackenv format.
+    :return: list of error messages, empty if all nodes are valid.
+    """
+    errors = []
+    # Kind of identifier -> {identifier: index of the first node using it}
+    seen = {'MAC address': {}, 'BMC address': {}, 'name': {}, 'UUID': {}}
+
+    for index, node in enumerate(nodes_list):
+        name = node.get('name') if isinstance(node, dict) else None
+        label = 'node %d%s' % (index, ' (%s)' % name if name else '')
+        try:
+            if not isinstance(node, dict):
+                raise exception.InvalidNode('a node must be an object')
+            handler = _find_node_handler(node)
+            handler.convert(node)
+            try:
+                unique_id = handler.unique_id_from_fields(node)
+            except KeyError as e:
+                raise exception.InvalidNode('%s is required' % e)
+            if not isinstance(node.get('mac', []), list):
+                raise exception.InvalidNode('mac must be a list')
+        except exception.InvalidNode as e:
+            errors.append('%s: %s' % (label, e))
+            continue
+
+        identifiers = [('MAC address', _normalize_mac(mac))
+                       for mac in node.get('mac', [])]
+        identifiers.extend([('BMC address', unique_id),
+                            ('name', name),
+                            ('UUID', node.get('uuid'))])
+        for kind, value in identifiers:
+            if not value:
+                continue
+            first = seen[kind].setdefault(value, index)
+            if first != index:
+                errors.append('%s: %s %s is already used by node %d' %
+                              (label, kind, value, first))
+
+    return errors
+
+
 def register_ironic_node(service_host, node, client=None, blocking=None):
     if blocking is not None:
         LOG.warning('blocking argument to register_ironic_node is deprecated '
@@ -268,19 +463,32 @@ def register_ironic_node(service_host, node, client=None, blocking=None):
 
 
 def _populate_node_mapping(client):
+    """Build the lookup indexes used to find already registered nodes.
+
+    The whole map is built from one node listing and one port listing,
+    joined locally on the node UUID, instead of listing ports per node.
+
+    :param client: An Ironic client object.
+    :return: dictionary with the following keys: ``mac`` (lower-cased MAC
+             address to node UUID), ``pm_addr`` (driver-specific unique ID
+             to node UUID), ``uuids`` (set of all node UUIDs) and ``nodes``
+             (node UUID to the node object as listed).
+    """
     LOG.debug('Populating list of registered nodes.')
-    node_map = {'mac': {}, 'pm_addr': {}, 'uuids': set()}
-    nodes = client.node.list(detail=True)
-    for node in nodes:
-        for port in client.node.list_ports(node.uuid):
-            node_map['mac'][port.address] = node.uuid
+    node_map = {'mac': {}, 'pm_addr': {}, 'uuids': set(), 'nodes': {}}
+    nodes = client.node.list(detail=True, limit=0)
+    ports = client.port.list(fields=['address', 'node_uuid'], limit=0)
+    for port in ports:
+        node_map['mac'][port.address.lower()] = port.node_uuid
 
+    for node in nodes:
         handler = _find_driver_handler(node.driver)
         unique_id = handler.unique_id_from_node(node)
         if unique_id:
             node_map['pm_addr'][unique_id] = node.uuid
 
         node_map['uuids'].add(node.uuid)
+        node_map['nodes'][node.uuid] = node
 
     return node_map
 
@@ -312,6 +520,35 @@ def _get_node_id(node, handler, node_map):
         return list(candidates)[0]
 
 
+# Ironic masks secrets (e.g. passwords) in driver_info when listing nodes
+_MASKED_VALUE = '******'
+
+
+def _patch_changes_node(ironic_node, path, value):
+    """Check whether adding value at path would modify the Ironic node."""
+    if ironic_node is None:
+        return True
+
+    field = path.strip('/').split('/')
+    try:
+        current = getattr(ironic_node, field[0])
+        if len(field) > 1:
+            current = current.get(field[1])
+    except AttributeError:
+        return True
+
+    if current is None or current == _MASKED_VALUE:
+        # Unknown value, assume it changed
+        return True
+    if field[-1] == 'capabilities':
+        # Compare parsed capabilities, their order does not matter
+        current, value = [
+            {k: six.text_type(v) for k, v in capabilities_to_dict(c).items()}
+            for c in (current, value)]
+        return current != value
+    return six.text_type(current) != six.text_type(value)
+
+
 def _update_or_register_ironic_node(service_host, node, node_map, client=None):
     handler = _find_node_handler(node)
     node_uuid = _get_node_id(node, handler, node_map)
@@ -336,34 +573,82 @@ def _update_or_register_ironic_node(service_host, node, node_map, client=None):
         for key, value in driver_info.items():
             patched['/driver_info/%s' % key] = value
 
+        # Only patch the fields which differ from the listed node, if any
+        current_node = node_map.get('nodes', {}).get(node_uuid)
         node_patch = []
         for key, value in patched.items():
             if key == 'uuid':
                 continue  # not needed during update
+            if not _patch_changes_node(current_node, key, value):
+                continue
             node_patch.append({'path': key,
                                'value': six.text_type(value),
                                'op': 'add'})
-        ironic_node = client.node.update(node_uuid, node_patch)
+
+        if node_patch:
+            ironic_node = client.node.update(node_uuid, node_patch)
+        else:
+            LOG.debug('Node %s is up to date, not updating it.', node_uuid)
+            ironic_node = current_node
     else:
         ironic_node = register_ironic_node(service_host, node, client)
 
     return ironic_node
 
 
-def _clean_up_extra_nodes(seen, client, remove=False):
-    all_nodes = {n.uuid for n in client.node.list()}
-    remove_func = client.node.delete
-    extra_nodes = all_nodes - {n.uuid for n in seen}
-    for node in extra_nodes:
-        if remove:
-            LOG.debug('Removing extra registered node %s.' % node)
-            remove_func(node)
-        else:
+def _clean_up_extra_nodes(seen, client, remove=False, node_map=None,
+                          concurrency=1):
+    """Find and optionally remove the registered nodes not in seen.
+
+    :param seen: list of the nodes which were registered or updated.
+    :param client: An Ironic client object.
+    :param remove: Should the extra nodes be removed?
+    :param node_map: The node map built before registration; its node list
+                     is reused instead of listing the nodes again.
+    :param concurrency: How many nodes to remove at the same time.
+    :return: dictionary mapping every extra node UUID to the exception
+             raised while removing it, or to None.
+    """
+    if node_map is not None:
+        all_nodes = node_map['uuids']
+    else:
+        all_nodes = {n.uuid for n in client.node.list()}
+    extra_nodes = sorted(all_nodes - {n.uuid for n in seen})
+
+    if not remove:
+        for node in extra_nodes:
             LOG.debug('Extra registered node %s found.' % node)
+        return dict.fromkeys(extra_nodes)
+
+    def _remove(node):
+        LOG.debug('Removing extra registered node %s.' % node)
+        client.node.delete(node)
+
+    futures = concurrency_utils.map_concurrently(
+        _remove, extra_nodes, concurrency=concurrency)
+    results = {}
+    for node, future in zip(extra_nodes, futures):
+        results[node] = future.exception()
+        if results[node] is not None:
+            LOG.error('Failed to remove extra registered node %s: %s',
+                      node, results[node])
+    return results
+
+
+def _provision_state_waiter(loops=None, sleep=None, waiter=None):
+    if waiter is not None:
+        return waiter
+    if loops is not None or sleep is not None:
+        # Legacy fixed polling scheme
+        return waiter_utils.Waiter.fixed(10 if loops is None else loops,
+                                         1 if sleep is None else sleep)
+    return waiter_utils.Waiter(
+        timeout=constants.PROVISION_STATE_TIMEOUT_DEFAULT, delay=1,
+        max_delay=10)
 
 
 def wait_for_provision_state(baremetal_client, node_uuid, provision_state,
-                             loops=10, sleep=1):
+                             loops=None, sleep=None, waiter=None):
     """Wait for a given Provisioning state in Ironic
 
     Updating the provisioning state is an async operation, we
@@ -378,44 +663,131 @@ def wait_for_provision_state(baremetal_client, node_uuid, provision_state,
     :param provision_state: The provisioning state name to wait for
     :type  provision_state: str
 
-    :param loops: How many times to loop
+    :param loops: How many times to loop, deprecated in favour of waiter
     :type loops: int
 
-    :param sleep: How long to sleep between loops
+    :param sleep: How long to sleep between loops, deprecated in favour of
+                  waiter
     :type sleep: int
 
+    :param waiter: How to poll the node. Defaults to an exponential backoff
+                   until constants.PROVISION_STATE_TIMEOUT_DEFAULT.
+    :type waiter: tripleo_common.utils.waiter.Waiter
+
     :raises exceptions.StateTransitionFailed: if node.last_error is set
     """
 
-    for _l in range(0, loops):
+    waiter = _provision_state_waiter(loops, sleep, waiter)
+    nodes = []
 
+    def _reached():
         # This will throw an exception if the UUID is not found, so no need to
         # check for node == None
         node = baremetal_client.node.get(node_uuid)
+        nodes.append(node)
 
         if node.provision_state == provision_state:
-            LOG.info('Node %s set to provision state %s',
-                     node_uuid, provision_state)
-            return
+            return True
 
         # node.last_error should be None after any successful operation
         if node.last_error:
             raise exception.StateTransitionFailed(node, provision_state)
 
-        time.sleep(sleep)
+    if waiter.wait(_reached):
+        LOG.info('Node %s set to provision state %s after %d polls',
+                 node_uuid, provision_state, waiter.polls)
+        return
 
     raise exception.Timeout(
         "Node %(uuid)s did not reach provision state %(state)s. "
         "Now in state %(actual)s." % {
             'uuid': node_uuid,
             'state': provision_state,
-            'actual': node.provision_state
+            'actual': nodes[-1].provision_state
         }
     )
 
 
+def wait_for_nodes_provision_state(baremetal_client, node_uuids,
+                                   provision_state, loops=None, sleep=None,
+                                   waiter=None):
+    """Wait for a given Provisioning state in Ironic for several nodes
+
+    All nodes are tracked in one polling loop, each iteration doing a single
+    node listing instead of fetching every node separately.
+
+    :param baremetal_client: Instance of Ironic client
+    :type  baremetal_client: ironicclient.v1.client.Client
+
+    :param node_uuids: The Ironic node UUIDs
+    :type  node_uuids: iterable of strings
+
+    :param provision_state: The provisioning state name to wait for
+    :type  provision_state: str
+
+    :param loops: How many times to loop, deprecated in favour of waiter
+    :type loops: int
+
+    :param sleep: How long to sleep between loops, deprecated in favour of
+                  waiter
+    :type sleep: int
+
+    :param waiter: How to poll the nodes. Defaults to an exponential backoff
+                   until constants.PROVISION_STATE_TIMEOUT_DEFAULT.
+    :type waiter: tripleo_common.utils.waiter.Waiter
+
+    :return: dictionary mapping every node UUID to None if the node reached
+             provision_state, or to the exception describing the failure
+             (exception.StateTransitionFailed or exception.Timeout).
+    """
+
+    waiter = _provision_state_waiter(loops, sleep, waiter)
+    pending = set(node_uuids)
+    results = {}
+    actual_states = {}
+
+    def _all_reached():
+        for node in baremetal_client.node.list(
+                fields=['uuid', 'provision_state', 'last_error'], limit=0):
+            if node.uuid not in pending:
+                continue
+            actual_states[node.uuid] = node.provision_state
+
+            if node.provision_state == provision_state:
+                LOG.info('Node %s set to provision state %s',
+                         node.uuid, provision_state)
+                results[node.uuid] = None
+                pending.discard(node.uuid)
+            # node.last_error should be None after any successful operation
+            elif node.last_error:
+                results[node.uuid] = exception.StateTransitionFailed(
+                    node, provision_state)
+                pending.discard(node.uuid)
+
+        return not pending
+
+    if pending:
+        waiter.wait(_all_reached)
+        LOG.debug('Waited for %d nodes to reach provision state %s with %d '
+                  'polls', len(results) + len(pending), provision_state,
+                  waiter.polls)
+
+    for node_uuid in pending:
+        results[node_uuid] = exception.Timeout(
+            "Node %(uuid)s did not reach provision state %(state)s. "
+            "Now in state %(actual)s." % {
+                'uuid': node_uuid,
+                'state': provision_state,
+                'actual': actual_states.get(node_uuid)
+            }
+        )
+
+    return results
+
+
 def set_nodes_state(baremetal_client, nodes, transition, target_state,
-                    skipped_states=()):
+                    skipped_states=(), batch=False, waiter=None,
+                    return_results=False):
     """Make all nodes available in the baremetal service for a deployment
 
     For each node whose provision_state is not in skipped_states, apply the
@@ -440,15 +812,33 @@ def set_nodes_state(baremetal_client, nodes, transition, target_state,
                            changed.
     :type  skipped_states: iterable of strings
 
-    :raises exception.Timeout: if a node takes too long to reach target state
+    :param batch: Apply the transition to all nodes first, then wait for all
+                  of them at once instead of waiting for each node in turn.
+    :type  batch: bool
+
+    :param waiter: How to poll the nodes, see wait_for_provision_state. By
+                   default every wait lasts up to
+                   constants.PROVISION_STATE_TIMEOUT_DEFAULT seconds, so
+                   without batch a node which never reaches target_state
+                   (and reports no error) delays the next nodes by that
+                   long.
+    :type  waiter: tripleo_common.utils.waiter.Waiter
+
+    :param return_results: Also return whether every node reached the target
+                           state.
+    :type  return_results: bool
 
     :return List of nodes whose provision states have been altered. These
             objects will be stale, and will not reflect the real node's current
-            provision_state.
+            provision_state. With return_results, a tuple of this list and of
+            a dictionary mapping the UUID of every altered node to None if it
+            reached target_state, or to the exception describing the failure
+            (exception.StateTransitionFailed or exception.Timeout).
     """
 
     log = logging.getLogger(__name__ + ".set_nodes_state")
     altered_nodes = []
+    results = {}
 
     for node in nodes:
 
@@ -460,21 +850,36 @@ def set_nodes_state(baremetal_client, nodes, transition, target_state,
             .format(node.provision_state, transition, node.uuid))
 
         baremetal_client.node.set_provision_state(node.uuid, transition)
-        try:
-            wait_for_provision_state(baremetal_client, node.uuid, target_state)
-        except exception.StateTransitionFailed as e:
-            log.error("FAIL: {0}".format(e))
-        except exception.Timeout as e:
-            log.error("FAIL: {0}".format(e))
+        if not batch:
+            results[node.uuid] = None
+            try:
+                wait_for_provision_state(baremetal_client, node.uuid,
+                                         target_state, waiter=waiter)
+            except exception.StateTransitionFailed as e:
+                log.error("FAIL: {0}".format(e))
+                results[node.uuid] = e
+            except exception.Timeout as e:
+                log.error("FAIL: {0}".format(e))
+                results[node.uuid] = e
         altered_nodes.append(node)
 
+    if batch and altered_nodes:
+        results = wait_for_nodes_provision_state(
+            baremetal_client, [node.uuid for node in altered_nodes],
+            target_state, waiter=waiter)
+        for node in altered_nodes:
+            if results[node.uuid] is not None:
+                log.error("FAIL: {0}".format(results[node.uuid]))
+
+    if return_results:
+        return altered_nodes, results
     return altered_nodes
 
 
 def register_all_nodes(service_host, nodes_list, client=None, remove=False,
                        blocking=True, keystone_client=None, glance_client=None,
                        kernel_name=None, ramdisk_name=None,
-                       provide=True):
+                       provide=True, concurrency=1):
     """Register all nodes in nodes_list in the baremetal service.
 
     :param service_host: The host providing the baremetal API.
@@ -487,10 +892,21 @@ def register_all_nodes(service_host, nodes_list, client=None, remove=False,
     :param kernel_name: Glance ID of the kernel to use for the nodes.
     :param ramdisk_name: Glance ID of the ramdisk to use for the nodes.
     :param provide: Should the node be transitioned to AVAILABLE state?
+    :param concurrency: How many nodes to register or update at the same
+                        time. When greater than 1, the provision state
+                        transitions are also applied to all nodes at once.
+                        Otherwise every node is waited for in turn, for up
+                        to constants.PROVISION_STATE_TIMEOUT_DEFAULT seconds
+                        each.
     :return: list of node objects representing the new nodes.
     """
 
     LOG.debug('Registering all nodes.')
+    errors = validate_nodes(nodes_list)
+    if errors:
+        raise exception.InvalidNode('%d invalid node(s) found:\n%s' %
+                                    (len(errors), '\n'.join(errors)))
+
     node_map = _populate_node_mapping(client)
 
     glance_ids = {'kernel': None, 'ramdisk': None}
@@ -498,28 +914,45 @@ def register_all_nodes(service_host, nodes_list, client=None, remove=False,
         glance_ids = glance.create_or_find_kernel_and_ramdisk(
             glance_client, kernel_name, ramdisk_name)
 
-    seen = []
     for node in nodes_list:
         if glance_ids['kernel'] and 'kernel_id' not in node:
             node['kernel_id'] = glance_ids['kernel']
         if glance_ids['ramdisk'] and 'ramdisk_id' not in node:
             node['ramdisk_id'] = glance_ids['ramdisk']
 
-        node = _update_or_register_ironic_node(service_host,
+        # Detect ambiguous node data before any node gets written, as
+        # registration below may run out of order.
+        _get_node_id(node, _find_node_handler(node), node_map)
+
+    def _register(node):
+        return _update_or_register_ironic_node(service_host,
                                                node, node_map,
                                                client=client)
-        seen.append(node)
 
-    _clean_up_extra_nodes(seen, client, remove=remove)
+    futures = concurrency_utils.map_concurrently(
+        _register, nodes_list, concurrency=concurrency)
+    seen = [future.result() for future in futures]
+
+    removed = _clean_up_extra_nodes(seen, client, remove=remove,
+                                    node_map=node_map,
+                                    concurrency=concurrency)
+    for error in removed.values():
+        if error is not None:
+            raise error
 
     if provide:
-        manageable_nodes = set_nodes_state(
+        batch = concurrency > 1
+        manageable_nodes, results = set_nodes_state(
             client, seen, "manage", "manageable",
-            skipped_states={'manageable', 'available'}
+            skipped_states={'manageable', 'available'}, batch=batch,
+            return_results=True
         )
+        # Nodes which did not become manageable cannot be provided
+        manageable_nodes = [node for node in manageable_nodes
+                            if results[node.uuid] is None]
         set_nodes_state(
             client, manageable_nodes, "provide", "available",
-            skipped_states={'available'}
+            skipped_states={'available'}, batch=batch
         )
 
     return seen
@@ -537,6 +970,50 @@ def register_all_nodes_compat(service_host, *args, **kwargs):
     register_all_nodes(service_host, *args, **kwargs)
 
 
+#: How many distinct capabilities strings are memoized by Capabilities.parse
+CAPABILITIES_CACHE_SIZE = 1024
+
+# capabilities string -> tuple of (key, value) pairs
+_capabilities_cache = {}
+
+
+class Capabilities(collections.OrderedDict):
+    """Node capabilities, keeping the order of the capabilities string.
+
+    Keys keep the order in which they appear in the parsed string, and new
+    keys are appended, so that converting the capabilities back to a string
+    only changes what was actually changed.
+    """
+
+    @classmethod
+    def parse(cls, caps):
+        """Parse a capabilities string such as 'profile:compute,a:b'.
+
+        Parse results are memoized, so parsing the capabilities of many
+        identical nodes is cheap. Malformed entries are skipped.
+        """
+        try:
+            pairs = _capabilities_cache[caps]
+        except KeyError:
+            pairs = []
+            for entry in caps.split(','):
+                key, sep, value = entry.partition(':')
+                if not key or not sep:
+                    if entry:
+                        LOG.warning('Ignoring malformed capability %r in '
+                                    '%r', entry, caps)
+                    continue
+                pairs.append((key, value))
+            pairs = tuple(pairs)
+            if len(_capabilities_cache) >= CAPABILITIES_CACHE_SIZE:
+                _capabilities_cache.clear()
+            _capabilities_cache[caps] = pairs
+        return cls(pairs)
+
+    def __str__(self):
+        return dict_to_capabilities(self)
+
+
 def dict_to_capabilities(caps_dict):
     """Convert a dictionary into a string with the capabilities syntax."""
     return ','.join(["%s:%s" % (key, value)
@@ -547,18 +1024,68 @@ def dict_to_capabilities(caps_dict):
 def capabilities_to_dict(caps):
     """Convert the Node's capabilities into a dictionary."""
     if not caps:
-        return {}
+        return Capabilities()
     if isinstance(caps, dict):
         return caps
-    return dict([key.split(':', 1) for key in caps.split(',')])
+    return Capabilities.parse(caps)
+
+
+def run_on_nodes(client, node_uuids, func, description, concurrency=1):
+    """Call a function on many nodes, fetched with a single listing.
+
+    Only the UUID and the properties of the nodes are fetched. Nodes which
+    are not found in Ironic are reported as errors.
+
+    :param client: An Ironic client object.
+    :param node_uuids: The UUIDs of the nodes.
+    :param func: Callable taking a node, called concurrently.
+    :param description: What func does, for the log messages, e.g.
+                        'update the capabilities'.
+    :param concurrency: How many nodes to process at the same time.
+    :return: tuple of two dictionaries: one mapping the UUIDs of the nodes
+             processed successfully to the value returned by func, and one
+             mapping the UUIDs of the other nodes to an error message.
+    """
+    wanted = set(node_uuids)
+    found = {node.uuid: node
+             for node in client.node.list(fields=['uuid', 'properties'],
+                                          limit=0)
+             if node.uuid in wanted}
+
+    def _run(node_uuid):
+        try:
+            node = found[node_uuid]
+        except KeyError:
+            raise ValueError('Node %s not found in Ironic' % node_uuid)
+        return func(node)
+
+    futures = concurrency_utils.map_concurrently(
+        _run, node_uuids, concurrency=concurrency)
+
+    results = {}
+    errors = {}
+    for node_uuid, future in zip(node_uuids, futures):
+        err = future.exception()
+        if err is None:
+            results[node_uuid] = future.result()
+        else:
+            LOG.error('Failed to %s of node %s: %s',
+                      description, node_uuid, err)
+            errors[node_uuid] = six.text_type(err)
+    return results, errors
 
 
 def _get_capability_patch(node, capability, value):
     """Return a JSON patch updating a node capability"""
+    return _get_capabilities_patch(node, {capability: value})
+
+
+def _get_capabilities_patch(node, new_capabilities):
+    """Return a JSON patch updating several node capabilities"""
     capabilities = node.properties.get('capabilities')
     capabilities_dict = capabilities_to_dict(capabilities)
 
-    capabilities_dict[capability] = value
+    capabilities_dict.update(new_capabilities)
     capabilities = dict_to_capabilities(capabilities_dict)
 
     return [{
@@ -580,3 +1107,27 @@ def update_node_capability(node_uuid, capability, value, client):
     node = client.node.get(node_uuid)
     patch = _get_capability_patch(node, capability, value)
     return client.node.update(node_uuid, patch)
+
+
+def update_nodes_capabilities(node_uuids, capabilities, client,
+                              concurrency=1):
+    """Update the capabilities of many nodes
+
+    All the nodes are fetched with a single listing and then updated
+    concurrently.
+
+    :param node_uuids: The UUIDs of the nodes
+    :param capabilities: Dictionary of the capabilities to set
+    :param client: An Ironic client object
+    :param concurrency: How many nodes to update at the same time
+    :return: dictionary mapping every node UUID to None on success or to
+             an error message.
+    """
+    def _update(node):
+        client.node.update(node.uuid,
+                           _get_capabilities_patch(node, capabilities))
+
+    _results, errors = run_on_nodes(
+        client, node_uuids, _update, 'update the capabilities',
+        concurrency=concurrency)
+    return {node_uuid: errors.get(node_uuid) for node_uuid in node_uuids}
@@ -14,8 +14,20 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import collections
+import logging
+import time
+
 from tripleo_common.utils import nodes
 
+LOG = logging.getLogger(__name__)
+
+#: How long (in seconds) the flavor index is cached
+FLAVOR_CACHE_TTL = 60
+
+# (compute endpoint, project) -> (expiry time, {profile: flavor name})
+_flavor_index = {}
+
 PARAMS = {
     'control': {
         'count': 'ControllerCount',
@@ -40,27 +52,130 @@ PARAMS = {
 }
 
 
+def get_node_counts(baremetal_client):
+    """Return the number of nodes tagged with every profile.
+
+    All the nodes are fetched with a single listing, only including the
+    fields needed to read their capabilities.
+
+    :param baremetal_client: An Ironic client object.
+    :return: dictionary mapping profile names to node counts.
+    """
+    counts = collections.Counter()
+    for node in baremetal_client.node.list(fields=['uuid', 'properties'],
+                                           limit=0):
+        caps = nodes.capabilities_to_dict(
+            (node.properties or {}).get('capabilities'))
+        profile = caps.get('profile')
+        if profile:
+            counts[profile] += 1
+    return dict(counts)
+
+
 def get_node_count(role, baremetal_client):
-    count = 0
-    for n in baremetal_client.node.list():
-        node = baremetal_client.node.get(n.uuid)
-        caps = nodes.capabilities_to_dict(node.properties['capabilities'])
+    return get_node_counts(baremetal_client).get(role, 0)
+
+
+def clear_flavor_cache():
+    """Forget the flavor indexes cached by get_flavor_index."""
+    _flavor_index.clear()
+
+
+def _flavor_cache_key(compute_client):
+    """Return the compute endpoint and project a Nova client talks to.
+
+    :return: tuple of the endpoint and the project, or None if they are not
+             known, in which case the flavors must not be cached.
+    """
+    http_client = getattr(compute_client, 'client', None)
+    endpoint = getattr(http_client, 'management_url', None)
+    project = (getattr(http_client, 'projectid', None) or
+               getattr(http_client, 'tenant_id', None))
+    if project is None and hasattr(http_client, 'get_project_id'):
+        try:
+            project = http_client.get_project_id()
+        except Exception:
+            project = None
+    if endpoint is None or project is None:
+        return None
+    return endpoint, project
+
 
-        if caps.get('profile') == role:
-            count += 1
-    return count
+def get_flavor_index(compute_client):
+    """Return the name of the flavor matching every profile.
+
+    The flavors are listed once with their details, and the resulting index
+    is cached for FLAVOR_CACHE_TTL seconds per compute endpoint and project.
+    When several flavors match the same profile, the first one listed wins.
+
+    :param compute_client: A Nova client object.
+    :return: dictionary mapping profile names to flavor names.
+    """
+    key = _flavor_cache_key(compute_client)
+    now = time.time()
+    cached = _flavor_index.get(key) if key is not None else None
+    if cached is not None and cached[0] >= now:
+        return cached[1]
+
+    index = {}
+    for flavor in compute_client.flavors.list(detailed=True):
+        # Newer compute API versions include the extra specs in the listing
+        extra_specs = getattr(flavor, 'extra_specs', None)
+        if extra_specs is None:
+            extra_specs = flavor.get_keys()
+        profile = extra_specs.get('capabilities:profile')
+        if profile:
+            index.setdefault(profile, flavor.name)
+
+    LOG.debug('Found flavors for profiles %s', ', '.join(sorted(index)))
+    if key is not None:
+        for old_key, (expiry, _index) in list(_flavor_index.items()):
+            if expiry < now:
+                _flavor_index.pop(old_key, None)
+        _flavor_index[key] = (now + FLAVOR_CACHE_TTL, index)
+    return index
 
 
 def get_flavor(role, compute_client):
-    for f in compute_client.flavors.list():
-        flavor = compute_client.flavors.get(f.id)
-        if flavor.get_keys().get('capabilities:profile') == role:
-            return flavor.name
-    return 'baremetal'
+    return get_flavor_index(compute_client).get(role, 'baremetal')
+
+
+def get_count_and_flavor_params(baremetal_client, compute_client,
+                                roles=None):
+    """Return the count and flavor parameters of many roles.
+
+    The nodes and the flavors are only listed once, whatever the number of
+    roles.
+
+    :param baremetal_client: An Ironic client object.
+    :param compute_client: A Nova client object.
+    :param roles: The roles to return the parameters for, defaults to all
+                  the roles in PARAMS.
+    :return: dictionary of the parameters.
+    """
+    if roles is None:
+        roles = list(PARAMS)
+    counts = get_node_counts(baremetal_client)
+    flavors = get_flavor_index(compute_client)
+
+    params = {}
+    for role in roles:
+        params[PARAMS[role]['count']] = counts.get(role, 0)
+        params[PARAMS[role]['flavor']] = flavors.get(role, 'baremetal')
+    return params
+
+
+def get_roles_from_role_data(role_data):
+    """Return the roles in PARAMS which are defined in a plan's role data.
+
+    :param role_data: The list of roles loaded from roles_data.yaml.
+    :return: list of keys of PARAMS.
+    """
+    names = {r.get('name') for r in role_data or () if isinstance(r, dict)}
+    return [role for role, params in sorted(PARAMS.items())
+            if params['count'][:-len('Count')] in names]
 
 
 def set_count_and_flavor_params(role, baremetal_client, compute_client):
-    return {
-        PARAMS[role]['count']: get_node_count(role, baremetal_client),
-        PARAMS[role]['flavor']: get_flavor(role, compute_client)
-    }
+    return get_count_and_flavor_params(baremetal_client, compute_client,
+                                       roles=[role])
@@ -0,0 +1,165 @@
+# Copyright 2016 Red Hat, Inc.
+# All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+import collections
+import functools
+import logging
+import sys
+import threading
+
+from ironicclient.common import base as ironic_base
+from ironicclient import exc as ironicexp
+import six
+
+from tripleo_common.utils import waiter as waiter_utils
+
+LOG = logging.getLogger(__name__)
+
+#: The errors from Ironic which are worth retrying
+IRONIC_RETRY_EXCEPTIONS = (ironicexp.Conflict, ironicexp.ServiceUnavailable,
+                           ironicexp.ConnectionRefused)
+
+#: Default maximum number of retries of a failed Ironic call
+IRONIC_MAX_RETRIES = 12
+
+#: Default delay (in seconds) before the first retry of an Ironic call
+IRONIC_RETRY_DELAY = 1
+
+#: Default maximum delay (in seconds) between two retries of an Ironic call
+IRONIC_RETRY_MAX_DELAY = 10
+
+#: Default time (in seconds) after which a failing Ironic call is given up
+IRONIC_RETRY_DEADLINE = 60
+
+_stats = collections.Counter()
+_stats_lock = threading.Lock()
+
+
+def get_stats():
+    """Return counters of the calls made with a retry policy.
+
+    :return: dictionary with the number of 'calls', of 'retried_calls' which
+             needed at least one retry, of 'retries' and of 'failures' (calls
+             which still failed when giving up).
+    """
+    with _stats_lock:
+        return dict(_stats)
+
+
+def reset_stats():
+    with _stats_lock:
+        _stats.clear()
+
+
+def _record(retries, failed):
+    with _stats_lock:
+        _stats['calls'] += 1
+        if retries:
+            _stats['retried_calls'] += 1
+            _stats['retries'] += retries
+        if failed:
+            _stats['failures'] += 1
+
+
+class RetryPolicy(object):
+    """Retry calls failing with transient errors, with exponential backoff.
+
+    :param max_retries: Maximum number of retries of a call.
+    :param delay: Delay (in seconds) before the first retry.
+    :param max_delay: Upper bound for the delay between two retries.
+    :param deadline: Time (in seconds) after which the call is given up,
+                     or None for no limit.
+    :param jitter: Fraction of the delay randomly added or removed, so that
+                   concurrent callers do not retry in lockstep.
+    :param retry_on: The exceptions to retry on.
+    """
+
+    def __init__(self, max_retries=IRONIC_MAX_RETRIES,
+                 delay=IRONIC_RETRY_DELAY, max_delay=IRONIC_RETRY_MAX_DELAY,
+                 deadline=IRONIC_RETRY_DEADLINE, jitter=0.1,
+                 retry_on=IRONIC_RETRY_EXCEPTIONS):
+        self.max_retries = max_retries
+        self.delay = delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+        self.jitter = jitter
+        self.retry_on = retry_on
+
+    def call(self, func, *args, **kwargs):
+        """Call func, retrying it according to the policy.
+
+        :raises: the last error of func if it still fails when giving up.
+        """
+        outcome = {}
+
+        def attempt():
+            try:
+                outcome['result'] = func(*args, **kwargs)
+            except self.retry_on as exc:
+                outcome['exc_info'] = sys.exc_info()
+                LOG.debug('Call to %(func)s failed: %(error)s',
+                          {'func': getattr(func, '__name__', func),
+                           'error': exc})
+                return False
+            return True
+
+        waiter = waiter_utils.Waiter(
+            timeout=self.deadline, delay=self.delay, max_delay=self.max_delay,
+            jitter=self.jitter,
+            max_polls=(None if self.max_retries is None
+                       else self.max_retries + 1))
+        try:
+            done = waiter.wait(attempt)
+        except Exception:
+            _record(waiter.polls - 1, True)
+            raise
+        _record(waiter.polls - 1, not done)
+        if not done:
+            LOG.error('Giving up calling %(func)s after %(polls)d attempts '
+                      '(%(elapsed).1f seconds)',
+                      {'func': getattr(func, '__name__', func),
+                       'polls': waiter.polls, 'elapsed': waiter.elapsed})
+            six.reraise(*outcome['exc_info'])
+        return outcome['result']
+
+
+#: The policy used when none is given, can be replaced to tune all calls
+default_policy = RetryPolicy()
+
+
+class RetryingIronicClient(object):
+    """Wrap an Ironic client so that its calls follow a retry policy.
+
+    The client should be created without retries of its own (with
+    max_retries=0).
+
+    :param client: The Ironic client to wrap.
+    :param policy: The RetryPolicy, defaults to default_policy at call time.
+    """
+
+    def __init__(self, client, policy=None):
+        self._client = client
+        self._policy = policy
+
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+        if isinstance(attr, ironic_base.Manager):
+            return RetryingIronicClient(attr, self._policy)
+        if callable(attr):
+            @functools.wraps(attr)
+            def wrapper(*args, **kwargs):
+                policy = self._policy or default_policy
+                return policy.call(attr, *args, **kwargs)
+            return wrapper
+        return attr
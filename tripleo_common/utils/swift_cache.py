@@ -0,0 +1,204 @@
+# Copyright 2016 Red Hat, Inc.
+# All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+import hashlib
+import logging
+import os
+import threading
+
+import requests
+from requests import adapters
+from swiftclient import exceptions as swiftexceptions
+
+from tripleo_common import constants
+from tripleo_common.utils import disk_cache
+
+LOG = logging.getLogger(__name__)
+
+
+class ObjectCache(object):
+    """On-disk cache of Swift objects, validated with their ETag.
+
+    Objects are always requested from Swift, but with an If-None-Match
+    header when they are cached, so that Swift only sends them again when
+    they changed. When the cache grows over max_size bytes, the least
+    recently used objects are removed.
+
+    The number of requests answered from the cache and from Swift are
+    counted in the ``hits`` and ``misses`` attributes.
+
+    Objects are cached per project, and an object read back from the disk
+    is only used if its MD5 matches its ETag (as it does for all the
+    objects but large ones, which are not cached).
+
+    HTTP requests are made with a single session, so that connections to
+    Swift are kept open and reused.
+
+    :param path: The directory to store the objects in, see
+                 disk_cache.PrivateDirectory.
+    :param max_size: The maximum size (in bytes) of the stored objects.
+    :param pool_size: The maximum number of connections kept open to Swift.
+    """
+
+    def __init__(self, path=None, max_size=None, pool_size=None):
+        if path is None:
+            path = (constants.PLAN_CACHE_DIR or
+                    disk_cache.default_directory('tripleo-plans'))
+        if max_size is None:
+            max_size = constants.PLAN_CACHE_SIZE
+        if pool_size is None:
+            pool_size = constants.PLAN_HTTP_POOL_SIZE
+        self.path = path
+        self.max_size = max_size
+        self.pool_size = pool_size
+        self._directory = disk_cache.PrivateDirectory(path)
+        self._session = None
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @property
+    def session(self):
+        """The requests Session used for HTTP requests, created lazily."""
+        with self._lock:
+            if self._session is None:
+                session = requests.Session()
+                adapter = adapters.HTTPAdapter(
+                    pool_connections=self.pool_size,
+                    pool_maxsize=self.pool_size)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                self._session = session
+            return self._session
+
+    def _object_path(self, url, project):
+        key = '%s\n%s' % (project or '', url)
+        digest = hashlib.sha256(key.encode('utf-8')).hexdigest()
+        return os.path.join(self.path, digest)
+
+    @staticmethod
+    def _matches(etag, content):
+        return hashlib.md5(content).hexdigest() == etag.strip('"')
+
+    def _load(self, url, project):
+        if not self._directory.available():
+            return None, None
+        # Cached files contain the ETag on the first line, then the object
+        try:
+            with open(self._object_path(url, project), 'rb') as f:
+                etag = f.readline().rstrip(b'\n').decode('utf-8')
+                content = f.read()
+        except (IOError, OSError, ValueError):
+            return None, None
+        if not self._matches(etag, content):
+            LOG.warning('Cached copy of %s does not match its ETag, '
+                        'ignoring it', url)
+            return None, None
+        return etag, content
+
+    def _store(self, url, project, etag, content):
+        if not self._directory.available():
+            return
+        if not self._matches(etag, content):
+            LOG.debug('ETag of %s is not its MD5, not caching it', url)
+            return
+        try:
+            disk_cache.atomic_write(self._object_path(url, project),
+                                    etag.encode('utf-8') + b'\n' + content)
+            with self._lock:
+                disk_cache.evict_lru(self.path, self.max_size)
+        except (IOError, OSError) as exc:
+            LOG.warning('Unable to cache %s: %s', url, exc)
+
+    def get(self, url, fetch, project=None):
+        """Return the content of an object, from the cache if still valid.
+
+        :param url: The URL of the object.
+        :param fetch: Callable taking the cached ETag (or None) and returning
+                      None if the object was not modified, or a tuple of the
+                      new ETag (None if it should not be cached) and the
+                      content of the object.
+        :param project: The project the object is requested for.
+        :return: The content of the object.
+        """
+        etag, content = self._load(url, project)
+        result = fetch(etag)
+        if result is None:
+            with self._lock:
+                self.hits += 1
+            disk_cache.touch(self._object_path(url, project))
+            LOG.debug('%s not modified, using the cached copy', url)
+            return content
+
+        with self._lock:
+            self.misses += 1
+        etag, content = result
+        if etag and isinstance(content, bytes):
+            self._store(url, project, etag, content)
+        return content
+
+    def request(self, method, url, token, project=None):
+        """Fetch an object with an HTTP request, as template_utils does."""
+        if method != 'GET':
+            return self.session.request(
+                method, url, headers={'X-Auth-Token': token}).content
+
+        def fetch(etag):
+            headers = {'X-Auth-Token': token}
+            if etag:
+                headers['If-None-Match'] = etag
+            resp = self.session.request(method, url, headers=headers)
+            if resp.status_code == 304:
+                return None
+            if resp.status_code != 200:
+                return None, resp.content
+            return resp.headers.get('ETag'), resp.content
+
+        return self.get(url, fetch, project=project)
+
+    def get_object(self, swift, container, name, project=None):
+        """Get an object with a swiftclient Connection.
+
+        :param project: The project the object is requested for.
+        :return: The content of the object.
+        """
+        url = '%s/%s/%s' % (swift.url, container, name)
+
+        def fetch(etag):
+            if not etag:
+                headers, content = swift.get_object(container, name)
+            else:
+                try:
+                    headers, content = swift.get_object(
+                        container, name, headers={'If-None-Match': etag})
+                except swiftexceptions.ClientException as exc:
+                    if exc.http_status == 304:
+                        return None
+                    raise
+            if not isinstance(headers, dict):
+                return None, content
+            return headers.get('etag'), content
+
+        return self.get(url, fetch, project=project)
+
+
+_default_cache = None
+
+
+def get_cache():
+    """Return the Swift object cache shared by the process."""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = ObjectCache()
+    return _default_cache
@@ -0,0 +1,162 @@
+# Copyright 2016 Red Hat, Inc.
+# All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+import collections
+import logging
+
+import six
+from six.moves.urllib import parse
+import yaml
+
+from tripleo_common import constants
+from tripleo_common.utils import concurrency as concurrency_utils
+
+LOG = logging.getLogger(__name__)
+
+_TEMPLATE_VERSION_KEYS = ('heat_template_version', 'HeatTemplateFormatVersion',
+                          'AWSTemplateFormatVersion')
+
+_TEMPLATE_SUFFIXES = ('.yaml', '.template')
+
+
+def _load(content):
+    try:
+        data = yaml.safe_load(content)
+    except Exception:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def _base_url(url):
+    return url.rsplit('/', 1)[0] + '/'
+
+
+def _template_references(template, url):
+    """Return the URLs of the files a template references.
+
+    Like heatclient's template_utils, these are the targets of get_file and
+    the resource types which are template files.
+    """
+    refs = set()
+
+    def walk(node):
+        if isinstance(node, dict):
+            for key, value in node.items():
+                if not isinstance(value, six.string_types):
+                    walk(value)
+                elif key == 'get_file':
+                    refs.add(value)
+                elif key == 'type' and value.endswith(_TEMPLATE_SUFFIXES):
+                    refs.add(value)
+        elif isinstance(node, list):
+            for value in node:
+                walk(value)
+
+    walk(template)
+    return {parse.urljoin(_base_url(url), ref) for ref in refs}
+
+
+def _environment_references(environment, url):
+    """Return the URLs of the files in the resource registry of an env."""
+    registry = environment.get('resource_registry')
+    if not isinstance(registry, dict):
+        return set()
+
+    def files(mapping, base_url):
+        for key, value in mapping.items():
+            if (key in ('base_url', 'hooks', 'restricted_actions') or
+                    not isinstance(value, six.string_types) or
+                    '::' in value):
+                continue
+            yield parse.urljoin(base_url, value)
+
+    base_url = registry.get('base_url', _base_url(url))
+    refs = set(files(registry, base_url))
+    resources = registry.get('resources')
+    if isinstance(resources, dict):
+        for res_dict in resources.values():
+            if isinstance(res_dict, dict):
+                refs.update(files(res_dict,
+                                  res_dict.get('base_url', base_url)))
+    return refs
+
+
+def references(content, url, environment=False):
+    """Return the URLs of the files referenced by a template or environment.
+
+    :param content: The content of the file.
+    :param url: The URL of the file, used to resolve relative references.
+    :param environment: Whether the file is an environment.
+    :return: set of URLs.
+    """
+    data = _load(content)
+    if data is None:
+        return set()
+    if environment:
+        return _environment_references(data, url)
+    if not any(key in data for key in _TEMPLATE_VERSION_KEYS):
+        # Not a template (e.g. a script loaded with get_file)
+        return set()
+    return _template_references(data, url)
+
+
+def prefetch(template_urls, environment_urls, fetch, url_filter=None,
+             concurrency=None):
+    """Download a template, environments and all the files they reference.
+
+    The files are downloaded concurrently, level by level: the files
+    referenced by a level are only known once it is downloaded.
+
+    :param template_urls: URLs of the root templates.
+    :param environment_urls: URLs of the environments.
+    :param fetch: Callable taking a URL and returning the file content.
+    :param url_filter: Callable returning whether a URL should be fetched.
+    :param concurrency: How many files to download at the same time,
+                        constants.PLAN_PREFETCH_CONCURRENCY by default.
+    :return: dictionary mapping URLs to their content. URLs which could not
+             be fetched are omitted.
+    """
+    if concurrency is None:
+        concurrency = constants.PLAN_PREFETCH_CONCURRENCY
+    contents = {}
+    queue = [(url, False) for url in template_urls]
+    queue += [(url, True) for url in environment_urls]
+
+    while queue:
+        queue = [(url, env) for url, env in queue
+                 if url not in contents and
+                 (url_filter is None or url_filter(url))]
+        # The same file can be referenced several times on one level
+        queue = list(collections.OrderedDict(queue).items())
+        if not queue:
+            break
+
+        futures = concurrency_utils.map_concurrently(
+            lambda item: fetch(item[0]), queue, concurrency=concurrency)
+
+        next_queue = []
+        for (url, env), future in zip(queue, futures):
+            if future.exception() is not None:
+                LOG.debug('Cannot prefetch %s: %s', url, future.exception())
+                # Do not try again, the caller will report the error
+                contents[url] = None
+                continue
+            contents[url] = future.result()
+            next_queue.extend((ref, False) for ref in
+                              references(contents[url], url, env))
+        queue = next_queue
+
+    LOG.debug('Prefetched %d files', len(contents))
+    return {url: content for url, content in contents.items()
+            if content is not None}
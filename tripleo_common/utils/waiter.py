@@ -0,0 +1,100 @@
+# Copyright 2016 Red Hat, Inc.
+# All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+import logging
+import random
+import time
+
+LOG = logging.getLogger(__name__)
+
+
+class Waiter(object):
+    """Poll a condition with exponential backoff until a deadline.
+
+    A Waiter can be reused for several waits; the statistics of the last
+    wait are available in the ``polls`` and ``elapsed`` attributes.
+
+    :param timeout: How long to wait in total (in seconds), or None to only
+                    rely on max_polls.
+    :param delay: Delay before the second poll (in seconds).
+    :param max_delay: Upper bound for the delay between two polls.
+    :param backoff: Factor applied to the delay after every poll.
+    :param jitter: Fraction of the delay randomly added or removed, so that
+                   many waiters do not poll in lockstep.
+    :param max_polls: Maximum number of polls, or None for no limit.
+    """
+
+    def __init__(self, timeout=None, delay=1, max_delay=30, backoff=2,
+                 jitter=0.1, max_polls=None):
+        self.timeout = timeout
+        self.delay = delay
+        self.max_delay = max_delay
+        self.backoff = backoff
+        self.jitter = jitter
+        self.max_polls = max_polls
+        self.polls = 0
+        self.elapsed = 0
+
+    @classmethod
+    def fixed(cls, loops, sleep):
+        """Create a waiter polling loops times, sleep seconds apart."""
+        return cls(delay=sleep, max_delay=sleep, backoff=1, jitter=0,
+                   max_polls=loops)
+
+    def _next_delay(self, delay):
+        if self.jitter:
+            delay += delay * random.uniform(-self.jitter, self.jitter)
+        return max(delay, 0)
+
+    def wait(self, condition):
+        """Call condition until it returns a true value.
+
+        Exceptions raised by condition are not caught, which is how callers
+        stop waiting early on terminal errors.
+
+        :param condition: callable without arguments.
+        :return: True if the condition was met, False if the deadline or
+                 the maximum number of polls was reached first.
+        """
+        start = time.time()
+        delay = self.delay
+        self.polls = 0
+        self.elapsed = 0
+
+        while True:
+            self.polls += 1
+            done = condition()
+            self.elapsed = time.time() - start
+            if done:
+                LOG.debug('Wait finished after %d polls (%.1f seconds)',
+                          self.polls, self.elapsed)
+                return True
+
+            if self.max_polls is not None and self.polls >= self.max_polls:
+                break
+
+            sleep = self._next_delay(delay)
+            if self.timeout is not None:
+                remaining = self.timeout - self.elapsed
+                if remaining <= 0:
+                    break
+                # Always poll one last time right at the deadline
+                sleep = min(sleep, remaining)
+
+            time.sleep(sleep)
+            delay = min(delay * self.backoff, self.max_delay)
+
+        LOG.debug('Wait gave up after %d polls (%.1f seconds)',
+                  self.polls, self.elapsed)
+        return False